@@ -1,7 +1,10 @@
+import json
 import logging
 import time
+from collections.abc import Mapping
 
-import pygtrie
+import segmenter
+import snapshot
 
 def syllable_tone_to_unicode(syllable:str, tone:int) -> str:
     diacritic_mappings = [
@@ -50,127 +53,361 @@ def reading_to_syllable(syllable: str) -> str:
         return syllable_tone_to_unicode(syllable[:-1], int(syllable[-1])-1)
     return syllable
 
+def reading_to_pinyin(reading: str) -> str:
+    """
+        Convert a CC-CEDICT reading to the ;-joined unicode reading served to clients
+        reading_to_pinyin("chao1 shi4") -> chāo;shì
+
+    Args:
+        reading (str): Space separated ascii reading
+
+    Returns:
+        str: Unicode reading
+    """
+    return ";".join([ _TONED_SYLLABLES.get(syllable) or reading_to_syllable(syllable) for syllable in reading.lower().split(" ")])
+
+def readings_to_pinyin(readings) -> list[str]:
+    """
+        Batch form of reading_to_pinyin
+        readings_to_pinyin(["chao1 shi4", "ni3 hao3"]) -> ["chāo;shì", "nǐ;hǎo"]
+
+    Args:
+        readings: Iterable of space separated ascii readings
+
+    Returns:
+        list[str]: Unicode readings, in the same order
+    """
+    table = _TONED_SYLLABLES
+    return [
+        ";".join([ table.get(syllable) or reading_to_syllable(syllable) for syllable in reading.lower().split(" ")])
+        for reading in readings
+    ]
+
+# Every standard pinyin syllable, plus CC-CEDICT's u: spelling of ü and interjections
+PINYIN_SYLLABLES = """
+a ai an ang ao ba bai ban bang bao bei ben beng bi bian biao bie bin bing bo bu ca cai can cang cao ce cei cen
+ceng cha chai chan chang chao che chen cheng chi chong chou chu chua chuai chuan chuang chui chun chuo ci cong
+cou cu cuan cui cun cuo da dai dan dang dao de dei den deng di dia dian diao die ding diu dong dou du duan dui
+dun duo e ei en eng er fa fan fang fei fen feng fo fou fu ga gai gan gang gao ge gei gen geng gong gou gu gua
+guai guan guang gui gun guo ha hai han hang hao he hei hen heng hong hou hu hua huai huan huang hui hun huo ji
+jia jian jiang jiao jie jin jing jiong jiu ju juan jue jun ka kai kan kang kao ke kei ken keng kong kou ku kua
+kuai kuan kuang kui kun kuo la lai lan lang lao le lei leng li lia lian liang liao lie lin ling liu lo long lou
+lu luan lun luo lv lve lu: lu:e ma mai man mang mao me mei men meng mi mian miao mie min ming miu mo mou mu na
+nai nan nang nao ne nei nen neng ni nian niang niao nie nin ning niu nong nou nu nuan nun nuo nv nve nu: nu:e o
+ou pa pai pan pang pao pei pen peng pi pian piao pie pin ping po pou pu qi qia qian qiang qiao qie qin qing
+qiong qiu qu quan que qun ran rang rao re ren reng ri rong rou ru rua ruan rui run ruo sa sai san sang sao se
+sen seng sha shai shan shang shao she shei shen sheng shi shou shu shua shuai shuan shuang shui shun shuo si
+song sou su suan sui sun suo ta tai tan tang tao te tei teng ti tian tiao tie ting tong tou tu tuan tui tun tuo
+wa wai wan wang wei wen weng wo wu xi xia xian xiang xiao xie xin xing xiong xiu xu xuan xue xun ya yan yang yao
+ye yi yin ying yo yong you yu yuan yue yun za zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei
+zhen zheng zhi zhong zhou zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou zu zuan zui zun zuo
+r m n ng hm hng ê
+""".split()
+
+# "chao1" -> "chāo" for every syllable and tone, computed once with reading_to_syllable
+# so lookups give exactly its output; anything else still goes through reading_to_syllable
+_TONED_SYLLABLES = {
+    syllable + str(tone): reading_to_syllable(syllable + str(tone))
+    for syllable in PINYIN_SYLLABLES
+    for tone in range(1, 6)
+}
+
 class CDictEntry:
+    __slots__ = ("id", "trad", "simp", "senses", "raw_reading", "_reading")
 
     def __init__(self, id, trad="", simp="", reading="", senses=[], ) :
         self.id = id
         self.trad = trad
         self.simp = simp
-        # print(reading)
-        self.reading = ";".join([ reading_to_syllable(syllable) for syllable in reading.lower().split(" ")])
         self.senses = senses
+        # Converted on first access, most entries are never read
+        self.raw_reading = reading
+        self._reading = None
+
+    @property
+    def reading(self) -> str:
+        if(self._reading is None):
+            self._reading = reading_to_pinyin(self.raw_reading)
+        return self._reading
+
+    def to_dict(self) -> dict:
+        """
+            JSON-ready form of the entry; slotted objects have no __dict__ for FastAPI to encode.
+        """
+        return {
+            "id": self.id,
+            "trad": self.trad,
+            "simp": self.simp,
+            "reading": self.reading,
+            "senses": self.senses,
+        }
+
+
+def parse_cedict(filepath):
+    """
+        Parse a CC-CEDICT file into (trad, simp, reading, senses) records, in file order.
+    """
+    with open(filepath, "r", encoding="utf-8") as file:
+        line = file.readline()
+        while(0 < len(line)):
+            if(line[0] != "#"):
+                # print(line)
+                j, k = 0, line.index(" ")
+                trad = line[j:k]
+                j, k = k + 1, line.index(" ", k + 1)
+                simp = line[j:k]
+                j, k = k + 2, line.index("]", k + 2)
+                reading = line[j:k]
+
+                senses = []
+                try:
+                    j, k = k + 3, line.index("/", k + 3)
+                    while(True):
+                        senses.append(line[j:k])
+                        j, k = k + 1, line.index("/", k + 1)
+                except ValueError:
+                    pass
+
+                yield trad, simp, reading, senses
+            line = file.readline()
+
+
+def entry_json(entry_id: int, record) -> bytes:
+    """
+        The JSON served for an entry, precomputed into the snapshot.
+    """
+    entry = CDictEntry(entry_id, *record)
+    return json.dumps(entry.to_dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CDictEntries(Mapping):
+    """
+        entry id -> CDictEntry, materialized from the snapshot on access.
+    """
+
+    def __init__(self, snap: snapshot.Snapshot):
+        self.snapshot = snap
+
+    def __getitem__(self, entry_id: int) -> CDictEntry:
+        if(not 0 <= entry_id < self.snapshot.entry_count):
+            raise KeyError(entry_id)
+        return CDictEntry(entry_id, *self.snapshot.entry(entry_id))
+
+    def __iter__(self):
+        return iter(range(self.snapshot.entry_count))
+
+    def __len__(self):
+        return self.snapshot.entry_count
+
+
+class CDictIndex(Mapping):
+    """
+        headword -> list of entry ids, backed by the snapshot.
+    """
+
+    def __init__(self, snap: snapshot.Snapshot):
+        self.snapshot = snap
+
+    def __getitem__(self, term: str) -> list[int]:
+        headword_id = self.snapshot.find(term)
+        if(headword_id < 0):
+            raise KeyError(term)
+        return list(self.snapshot.postings_of(headword_id))
+
+    def __contains__(self, term):
+        return isinstance(term, str) and 0 <= self.snapshot.find(term)
+
+    def __iter__(self):
+        return (self.snapshot.headword(i) for i in range(self.snapshot.headword_count))
+
+    def __len__(self):
+        return self.snapshot.headword_count
+
 
 class CDict:
-    def __init__(self, filepath):
+    def __init__(self, filepath, snap: snapshot.Snapshot = None):
         self.filepath = filepath
-        self.search_trie = pygtrie.CharTrie()
-        self.load()
+        if(snap is None):
+            self.load()
+        else:
+            self.attach(snap)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path: str, source_path: str = None,
+                      frequency_path: str = segmenter.JIEBA_DICTIONARY) -> "CDict":
+        """
+            Load a dictionary from a precompiled snapshot, rebuilding the snapshot
+            first if source_path or frequency_path has changed since it was compiled.
+
+        Args:
+            snapshot_path (str): Snapshot file, see snapshot.py
+            source_path (str): CC-CEDICT source file, or None to trust the snapshot
+            frequency_path (str): Word frequencies ranking suggestions, jieba format
+
+        Returns:
+            CDict: The loaded dictionary
+        """
+        start = time.perf_counter()
+        snap = snapshot.load_or_build(snapshot_path, source_path, parse_cedict, entry_json, frequency_path)
+        c_dict = cls(source_path, snap)
+        elapsed = time.perf_counter() - start
+        logging.info("Dictionary snapshot loaded. Took %.3fs.", elapsed)
+        logging.info("%d entries loaded.", len(c_dict.entries))
+        return c_dict
+
+    @staticmethod
+    def compile_snapshot(snapshot_path: str, source_path: str,
+                         frequency_path: str = segmenter.JIEBA_DICTIONARY, output_path: str = None) -> bool:
+        """
+            Rebuild the snapshot if its sources changed, without loading a CDict.
+            Meant to run in a separate process, building is CPU-bound.
+
+        Args:
+            output_path (str): Where a rebuilt snapshot is written instead of
+                snapshot_path, so it can be checked before it replaces the live one
+
+        Returns:
+            bool: Whether a snapshot was built
+        """
+        return snapshot.rebuild_if_stale(snapshot_path, source_path, parse_cedict, entry_json, frequency_path, output_path)
+
+    def memory_size(self) -> int:
+        """
+            Bytes of the snapshot backing this dictionary (mapped, so shared between processes).
+        """
+        return len(self.snapshot.image)
 
     def load(self):
         start = time.perf_counter()
         logging.info("Loading dictionary...")
 
-        self.entries = {}
-        self.index = {}
-        with open(self.filepath, "r", encoding="utf-8") as file:
-            
-            i = 0
-            line = file.readline()
-            while(0 < len(line)):
-                if(line[0] != "#"):
-                    # print(line)
-                    j, k = 0, line.index(" ")
-                    trad = line[j:k]
-                    j, k = k + 1, line.index(" ", k + 1)
-                    simp = line[j:k]
-                    j, k = k + 2, line.index("]", k + 2)
-                    reading = line[j:k]
-
-                    senses = []
-                    try:
-                        j, k = k + 3, line.index("/", k + 3)
-                        while(True):
-                            senses.append(line[j:k])
-                            j, k = k + 1, line.index("/", k + 1)
-                    except ValueError:
-                        pass
-                    
-                    self.entries[i] = CDictEntry(i, trad, simp, reading, senses)
-
-                    self.search_trie[trad] = "True"
-                    self.search_trie[simp] = "True"
-                    if(trad in self.index):
-                        self.index[trad].append(i)
-                    else:
-                        self.index[trad] = [i]
-                    
-                    if(trad != simp):
-                        if(simp in self.index):
-                            self.index[simp].append(i)
-                        else:
-                            self.index[simp] = [i]
-
-                    i += 1
-                line = file.readline()
-
-            # root = ET.parse(file)
+        frequency_path = segmenter.JIEBA_DICTIONARY
+        image = snapshot.build_image(
+            parse_cedict(self.filepath), snapshot.sources_digest(self.filepath, frequency_path), entry_json,
+            snapshot.read_frequencies(frequency_path),
+        )
+        self.attach(snapshot.Snapshot(image))
 
         elapsed = time.perf_counter() - start
         logging.info("Dictionary Loaded. Took %ds.", elapsed)
         logging.info("%d entries loaded.", len(self.entries))
 
+    def attach(self, snap: snapshot.Snapshot):
+        self.snapshot = snap
+        self.entries = CDictEntries(snap)
+        self.index = CDictIndex(snap)
+        self.search_trie = snap.trie
+        # Identifies the dictionary data, for HTTP caching
+        self.version = snap.source_digest.hex()[:16]
+
 
     def tokenize(self, text : str):
-        i = 0
-        n = len(text)
+        """
+            Longest-match segmentation; characters that start no headword become None.
+        """
+        return [
+            text[start:end] if(0 <= headword_id) else None
+            for start, end, headword_id in self.search_trie.segment(text)
+        ]
 
-        out = []
-        while(i < n):
-            token = self.search_trie.longest_prefix(text[i:], ).key
-            # print(token, text[i: ])
-            if(token is None):
-                out.append(token)
-                # out.append({
-                #     "token": text[i],
-                #     "type": "noun"
-                # })
-                i += 1
-                continue
-            # out.append({
-            #     "token": token,
-            #     "type": "noun",
-            #     "index": i
-            # })
-            out.append(token)
-            i += len(token)
-        return out
-        
-        
-
-
-    def tokenize_search(self, text:str):
-        # print(dict.tokenizer.parse(text))
-        for token_info in self.tokenizer.parse(text).strip().split("\n"):
-            token_info = token_info.split()
-            if(token_info[0] == "EOS"):
-                continue
-            print(token_info)
-            
-            # self.search(token_info[0])
+    def tokenize_spans(self, text: str, final: bool = True):
+        """
+            Longest-match segmentation as (start, end, headword id) spans over text,
+            see segmenter.DoubleArrayTrie.segment.
+        """
+        return self.search_trie.segment(text, final=final)
 
+    def annotate(self, texts: list[str], segment=None) -> dict:
+        """
+            Segment texts and attach the dictionary entries of every token, looking
+            each distinct headword up once. Whitespace-only tokens are left out.
 
+        Args:
+            texts (list[str]): Texts to segment
+            segment: callable text -> list of (start, end) token spans, e.g. jieba's
+                full mode through segmenter.full_mode_spans; longest match if None
+
+        Returns:
+            dict: {"texts": one token list per text, each token {"token", "start", "end"},
+                   "entries": {token: list of CDictEntry.to_dict()}}; tokens without
+                   an entry are absent from "entries"
+        """
+        out = []
+        entries = {}
+        looked_up = set()
+        for text in texts:
+            if(segment is None):
+                spans = [(start, end) for start, end, _ in self.search_trie.segment(text)]
+            else:
+                spans = segment(text)
+            tokens = []
+            for start, end in spans:
+                token = text[start:end]
+                if(not token.strip()):
+                    continue
+                tokens.append({"token": token, "start": start, "end": end})
+                if(token not in looked_up):
+                    looked_up.add(token)
+                    headword_id = self.snapshot.find(token)
+                    if(0 <= headword_id):
+                        entries[token] = [
+                            self.entries[e].to_dict() for e in self.snapshot.postings_of(headword_id)
+                        ]
+            out.append(tokens)
+        return {"texts": out, "entries": entries}
+
+    def search_json(self, term: str) -> bytes:
+        """
+            JSON array of the entries of term, assembled from the precomputed entry
+            JSON in the snapshot, or None if term is not a headword.
+        """
+        headword_id = self.snapshot.find(term)
+        if(headword_id < 0):
+            return None
+        return b"[" + b",".join([self.snapshot.entry_json(e) for e in self.snapshot.postings_of(headword_id)]) + b"]"
 
     def search(self, term : str) -> list[CDictEntry]:
-        if(term in self.index):
-            return [self.entries[e] for e in self.index[term]]
+        headword_id = self.snapshot.find(term)
+        if(0 <= headword_id):
+            return [self.entries[e] for e in self.snapshot.postings_of(headword_id)]
             # print(self.entries[kanji])
         else:
             return None
             # print(kanji+" unknown")
 
+    def search_english(self, query: str, limit: int = 20) -> list[CDictEntry]:
+        """
+            Entries whose English senses best match query (BM25), best first.
+        """
+        return [self.entries[e] for e, _ in self.snapshot.english.search(query, limit)]
+
+    def search_english_json(self, query: str, limit: int = 20) -> bytes:
+        """
+            search_english as a JSON array, assembled from the precomputed entry JSON.
+        """
+        return b"[" + b",".join([self.snapshot.entry_json(e) for e, _ in self.snapshot.english.search(query, limit)]) + b"]"
+
+    def search_pinyin(self, query: str, limit: int = 20) -> list[CDictEntry]:
+        """
+            Entries whose reading starts with the pinyin query, see PinyinIndex.search.
+        """
+        return [self.entries[e] for e in self.snapshot.pinyin.search(query, limit)]
+
+    def search_pinyin_json(self, query: str, limit: int = 20) -> bytes:
+        """
+            search_pinyin as a JSON array, assembled from the precomputed entry JSON.
+        """
+        return b"[" + b",".join([self.snapshot.entry_json(e) for e in self.snapshot.pinyin.search(query, limit)]) + b"]"
+
+    def suggest(self, prefix: str, limit: int = segmenter.SUGGEST_TOP_K) -> list[str]:
+        """
+            The most frequent headwords starting with prefix, see DoubleArrayTrie.complete.
+        """
+        return [self.snapshot.headword(h) for h in self.search_trie.complete(prefix, limit)]
+
 
 if __name__ == "__main__":
-    d = CDict("./data/cedict_ts.txt")
+    d = CDict.from_snapshot("./data/cedict_ts.snapshot", "./data/cedict_ts.txt")
     print(d.search("超級市場")[0].reading)
     # print(syllable_tone_to_unicode("gui", 1))
     # print(syllable_tone_to_unicode("lan", 2))
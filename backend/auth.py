@@ -28,6 +28,11 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:3000/auth/callback")
 
+# Let read-only routes build the user from the signed token's claims instead of the
+# database: a deleted or renamed user keeps reading with the old claims until the
+# token expires
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
 # OAuth2 scheme for Swagger UI
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
@@ -60,7 +65,7 @@ def decode_token(token: str) -> Dict[str, Any]:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired",
         )
-    except jwt.JWTError as e:
+    except jwt.PyJWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
@@ -158,14 +163,11 @@ async def get_google_user_info(token: Dict[str, Any]) -> Dict[str, Any]:
             
         return response.json()
 
-async def get_current_user(request: Request) -> User:
+def token_payload(request: Request) -> Dict[str, Any]:
     """
-    Authenticate a user from JWT token in Authorization header or cookie
-    Returns a User object if authentication succeeds, or raises an HTTPException
+    Verified claims of the JWT token in the cookie or Authorization header,
+    raises a 401 HTTPException without a valid token naming a user
     """
-    # Import here to avoid circular imports
-    from database import get_user_by_id
-    
     token = None
     
     # Check for JWT token in cookie
@@ -186,19 +188,27 @@ async def get_current_user(request: Request) -> User:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Decode the token
+    payload = decode_token(token)
+    if not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token payload",
+        )
+    return payload
+
+async def get_current_user(request: Request) -> User:
+    """
+    Authenticate a user from JWT token in Authorization header or cookie
+    Returns a User object if authentication succeeds, or raises an HTTPException
+    """
+    # Import here to avoid circular imports
+    from database import get_cached_user
+    
+    payload = token_payload(request)
     try:
-        # Decode the token
-        payload = decode_token(token)
-        user_id = payload.get("sub")
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token payload",
-            )
-        
-        # Get user from database
-        user = await get_user_by_id(user_id)
+        # Get user from database, or the recently used users
+        user = await get_cached_user(payload["sub"])
         
         if not user:
             raise HTTPException(
@@ -224,6 +234,20 @@ async def get_current_user(request: Request) -> User:
             detail="Internal server error during authentication",
         )
 
+async def get_reading_user(request: Request) -> User:
+    """
+    get_current_user for read-only routes. With AUTH_TRUST_TOKEN_CLAIMS the user is
+    built from the token's sub, email and name claims, without a database lookup.
+    """
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        payload = token_payload(request)
+        try:
+            return User(id=payload["sub"], email=payload.get("email"), name=payload.get("name"))
+        except ValueError:
+            # Tokens without a usable email or name, e.g. issued before they were claims
+            pass
+    return await get_current_user(request)
+
 async def get_optional_user(request: Request) -> Optional[User]:
     """Similar to get_current_user but returns None if not authenticated"""
     try:
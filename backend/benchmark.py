@@ -0,0 +1,242 @@
+"""
+    Dictionary benchmarks. Run from the backend directory, e.g.
+
+        python benchmark.py memory
+        python benchmark.py tokenize
+        python benchmark.py pinyin
+        python benchmark.py flashcards   (needs the DB_* settings of database.py)
+
+    Correctness checks live in tests/, run them with python -m pytest tests
+    (tests/test_roundtrips.py counts Mongo commands against MONGODB_TEST_URI)
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import time
+import tracemalloc
+
+import CDict
+
+SNAPSHOT_PATH = "./data/cedict_ts.snapshot"
+SOURCE_PATH = "./data/cedict_ts.txt"
+
+
+class DictEntry:
+    """
+        The original CDictEntry layout: per-instance __dict__ and a reading
+        converted eagerly in __init__.
+    """
+
+    def __init__(self, id, trad, simp, reading, senses):
+        self.id = id
+        self.trad = trad
+        self.simp = simp
+        self.reading = CDict.reading_to_pinyin(reading)
+        self.senses = senses
+
+
+def traced_bytes(build) -> int:
+    """
+        Bytes still allocated by the object graph returned by build().
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_memory(args):
+    c_dict = CDict.CDict.from_snapshot(args.snapshot, args.source)
+    snap = c_dict.snapshot
+    records = [snap.entry(i) for i in range(snap.entry_count)]
+    count = len(records)
+
+    def eager_dict_entries():
+        # What CDict.load used to keep: entries, index and every reading converted
+        entries = {i: DictEntry(i, *record) for i, record in enumerate(records)}
+        index = {}
+        for i, (trad, simp, _, _) in enumerate(records):
+            index.setdefault(trad, []).append(i)
+            if(trad != simp):
+                index.setdefault(simp, []).append(i)
+        return entries, index
+
+    def slotted_entries():
+        return [CDict.CDictEntry(i, *record) for i, record in enumerate(records)]
+
+    print(f"{count} entries (object sizes exclude the shared field strings)")
+    print(f"dict entries + index (before):    {traced_bytes(eager_dict_entries) / count:8.1f} bytes/entry")
+    print(f"slotted entries, all materialized: {traced_bytes(slotted_entries) / count:8.1f} bytes/entry")
+    print(f"snapshot, shared mmap (after):     {os.path.getsize(args.snapshot) / count:8.1f} bytes/entry")
+
+
+def sample_text(c_dict: CDict.CDict, length: int, seed: int = 131) -> str:
+    """
+        Reproducible text of dictionary words mixed with punctuation and latin letters.
+    """
+    rng = random.Random(seed)
+    headwords = list(c_dict.index)
+    parts = []
+    size = 0
+    while(size < length):
+        part = rng.choice(headwords) if rng.random() < 0.9 else rng.choice("，。！？abc 123")
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)[:length]
+
+
+def pygtrie_tokenize(search_trie, text: str):
+    """
+        The original CDict.tokenize: pygtrie longest_prefix on a fresh slice per position.
+    """
+    i = 0
+    out = []
+    while(i < len(text)):
+        token = search_trie.longest_prefix(text[i:]).key
+        if(token is None):
+            out.append(None)
+            i += 1
+            continue
+        out.append(token)
+        i += len(token)
+    return out
+
+
+def throughput(tokenize, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokenize(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text) / best
+
+
+def bench_tokenize(args):
+    c_dict = CDict.CDict.from_snapshot(args.snapshot, args.source)
+    text = sample_text(c_dict, args.length)
+    print(f"{len(text)} characters, best of {args.repeat}")
+
+    print(f"double-array trie spans:  {throughput(c_dict.tokenize_spans, text, args.repeat):12,.0f} chars/s")
+    print(f"double-array trie tokens: {throughput(c_dict.tokenize, text, args.repeat):12,.0f} chars/s")
+
+    try:
+        import pygtrie
+    except ImportError:
+        print("pygtrie not installed, skipping the pygtrie baseline")
+        return
+    search_trie = pygtrie.CharTrie()
+    for headword in c_dict.index:
+        search_trie[headword] = "True"
+    assert pygtrie_tokenize(search_trie, text) == c_dict.tokenize(text)
+    print(f"pygtrie longest_prefix:   {throughput(lambda t: pygtrie_tokenize(search_trie, t), text, args.repeat):12,.0f} chars/s")
+
+
+def reference_pinyin(reading: str) -> str:
+    """
+        The original reading_to_pinyin: reading_to_syllable on every syllable.
+    """
+    return ";".join([ CDict.reading_to_syllable(syllable) for syllable in reading.lower().split(" ")])
+
+
+def bench_pinyin(args):
+    readings = [reading for _, _, reading, _ in CDict.parse_cedict(args.source)]
+
+    # tests/test_pinyin.py checks that both conversions give the same output
+    def best(convert):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            convert()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    before = best(lambda: [reference_pinyin(reading) for reading in readings])
+    after = best(lambda: CDict.readings_to_pinyin(readings))
+    print(f"convert every reading, per syllable (before): {before:7.3f}s")
+    print(f"convert every reading, lookup table (after):  {after:7.3f}s")
+
+    # Full in-memory dictionary load, whose entry JSON converts every reading
+    table = CDict._TONED_SYLLABLES
+    try:
+        CDict._TONED_SYLLABLES = {}
+        before = best(lambda: CDict.CDict(args.source))
+    finally:
+        CDict._TONED_SYLLABLES = table
+    after = best(lambda: CDict.CDict(args.source))
+    print(f"CDict load without table (before):            {before:7.3f}s")
+    print(f"CDict load with table (after):                {after:7.3f}s")
+
+
+async def run_flashcards(args):
+    # Imported here, database.py requires the DB_* environment variables
+    import database
+
+    database.DB_NAME = args.database
+    await database.init_db()
+    collection = await database.get_flashcards_collection()
+    try:
+        print(f"database {args.database}, median of {args.repeat}")
+        print(f"{'cards':>6} {'per card (before)':>18} {'one $in (after)':>16}")
+        for size in args.sizes:
+            await collection.delete_many({})
+            result = await collection.insert_many([
+                {"term": f"词{i}", "reading": "cí", "definition": f"card {i}"} for i in range(size)
+            ])
+            # Decks keep insertion order, not _id order
+            card_ids = list(reversed(result.inserted_ids))
+
+            async def per_card():
+                return [card for card in [await database.get_flashcard(str(card_id)) for card_id in card_ids] if card]
+
+            async def batched():
+                return await database.get_flashcards_by_ids(card_ids)
+
+            assert [card["_id"] for card in await batched()] == card_ids
+            timings = []
+            for fetch in (per_card, batched):
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    await fetch()
+                    samples.append(time.perf_counter() - start)
+                timings.append(sorted(samples)[len(samples) // 2])
+            print(f"{size:>6} {timings[0] * 1000:>15.1f}ms {timings[1] * 1000:>13.1f}ms")
+    finally:
+        await database.db.client.drop_database(args.database)
+        await database.close_db()
+
+
+def bench_flashcards(args):
+    asyncio.run(run_flashcards(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH)
+    parser.add_argument("--source", default=SOURCE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("memory", help="bytes per dictionary entry").set_defaults(run=bench_memory)
+
+    tokenize = commands.add_parser("tokenize", help="CDict.tokenize throughput")
+    tokenize.add_argument("--length", type=int, default=100_000)
+    tokenize.add_argument("--repeat", type=int, default=3)
+    tokenize.set_defaults(run=bench_tokenize)
+
+    pinyin = commands.add_parser("pinyin", help="reading conversion and dictionary load time")
+    pinyin.add_argument("--repeat", type=int, default=3)
+    pinyin.set_defaults(run=bench_pinyin)
+
+    flashcards = commands.add_parser("flashcards", help="deck card listing latency against deck size")
+    flashcards.add_argument("--database", default="langlearn_benchmark", help="scratch database, dropped afterwards")
+    flashcards.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    flashcards.add_argument("--repeat", type=int, default=5)
+    flashcards.set_defaults(run=bench_flashcards)
+
+    args = parser.parse_args()
+    args.run(args)
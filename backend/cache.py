@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+
+
+class EvictionPolicy:
+    """
+        Decides which key a full Cache drops. Subclasses track key order.
+    """
+
+    def __init__(self):
+        self.order = OrderedDict()
+
+    def inserted(self, key):
+        self.order[key] = None
+
+    def accessed(self, key):
+        pass
+
+    def removed(self, key):
+        self.order.pop(key, None)
+
+    def victim(self):
+        return next(iter(self.order))
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+        Evict the least recently used key.
+    """
+
+    def accessed(self, key):
+        self.order.move_to_end(key)
+
+
+class FIFOPolicy(EvictionPolicy):
+    """
+        Evict the oldest inserted key, regardless of use.
+    """
+    pass
+
+
+POLICIES = {
+    "lru": LRUPolicy,
+    "fifo": FIFOPolicy,
+}
+
+
+class Cache:
+    """
+        Size-bounded in-process cache with an optional TTL and hit/miss counters.
+        Not thread-safe: use it from the event loop.
+
+    Args:
+        max_size (int): Most entries kept; 0 disables the cache
+        ttl (float): Seconds an entry stays valid, None or 0 for no expiry
+        policy (str | EvictionPolicy): "lru", "fifo" or a policy instance
+    """
+
+    def __init__(self, name: str, max_size: int = 4096, ttl: float = None, policy="lru"):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.policy = POLICIES[policy]() if isinstance(policy, str) else policy
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        item = self.entries.get(key)
+        if(item is not None):
+            expires, value = item
+            if(expires is None or time.monotonic() < expires):
+                self.hits += 1
+                self.policy.accessed(key)
+                return value
+            self.delete(key)
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        if(self.max_size <= 0):
+            return
+        if(key in self.entries):
+            self.policy.accessed(key)
+        else:
+            while(self.max_size <= len(self.entries)):
+                self.delete(self.policy.victim())
+                self.evictions += 1
+            self.policy.inserted(key)
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        self.entries[key] = (expires, value)
+
+    def delete(self, key):
+        if(self.entries.pop(key, None) is not None):
+            self.policy.removed(key)
+
+    def clear(self):
+        for key in list(self.entries):
+            self.delete(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,10 +1,14 @@
-from pymongo.errors import DuplicateKeyError
+import asyncio
+import threading
+from pymongo import ASCENDING, IndexModel, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson.objectid import ObjectId
 from datetime import datetime
 import os
 import logging
 from dotenv import load_dotenv
+import cache
 load_dotenv()
 
 logger = logging.getLogger("database")
@@ -22,6 +26,107 @@ DB_NAME = os.getenv("DB_NAME", "langlearn")
 
 MONGODB_URL = f"mongodb+srv://{DB_USERNAME}:{DB_PASSWORD}@{DB_CLUSTER}/?retryWrites=true&w=majority&appName=langlearning-cluster"
 
+def _env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+# Connection pool of each server, unset values keep the driver defaults. Every worker
+# process has its own pool, so workers * MONGO_MAX_POOL_SIZE must fit the cluster's
+# connection limit.
+POOL_OPTIONS = {
+    option: value for option, value in {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE"),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE"),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS"),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS"),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+    }.items() if value is not None
+}
+# Connections opened by init_db so the first requests don't pay for the handshakes
+MONGO_WARM_CONNECTIONS = _env_int("MONGO_WARM_CONNECTIONS") or POOL_OPTIONS.get("minPoolSize", 0)
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool counters of each server, for sizing the pool"""
+
+    def __init__(self):
+        # Events come from the driver's threads
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    def _pool(self, address):
+        pool = self.pools.get(address)
+        if pool is None:
+            pool = self.pools[address] = {
+                "open": 0, "in_use": 0, "max_in_use": 0, "waiting": 0, "max_waiting": 0,
+                "checkouts": 0, "checkout_failures": 0, "checkout_timeouts": 0, "cleared": 0,
+            }
+        return pool
+
+    def _update(self, address, **changes):
+        with self.lock:
+            pool = self._pool(address)
+            for counter, change in changes.items():
+                pool[counter] += change
+            pool["max_in_use"] = max(pool["max_in_use"], pool["in_use"])
+            pool["max_waiting"] = max(pool["max_waiting"], pool["waiting"])
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.pools.pop(event.address, None)
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        timeout = event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT
+        self._update(event.address, waiting=-1, checkout_failures=1, checkout_timeouts=int(timeout))
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, in_use=-1)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {f"{host}:{port}": dict(pool) for (host, port), pool in self.pools.items()}
+
+pool_monitor = PoolMonitor()
+
+# Users by id (the JWT "sub"), so authenticating a request rarely needs a query.
+# update_user and get_or_create_user drop a user's entry; other worker processes
+# see the change when their entry expires, hence the short TTL. Like the response
+# caches, a size of 0 disables it and a TTL of 0 means no expiry.
+user_cache = cache.Cache(
+    "user",
+    max_size=int(os.getenv("USER_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "30")),
+)
+# Bumped by every invalidation. get_cached_user only caches a read if no invalidation
+# happened meanwhile, since that read may have returned the user from before the write.
+user_cache_generation = 0
+
+# The process's client, created on first use and closed by close_db
+client = None
 db = None
 
 # Helper functions for common operations
@@ -32,21 +137,84 @@ def to_object_id(id_value):
     return id_value
 
 def get_timestamp():
-    """Get current timestamp for database operations"""
-    return datetime.utcnow()
+    """
+    Get current timestamp for database operations, at the millisecond precision
+    MongoDB stores, so an inserted document equals what a read would return
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def get_client():
+    """The shared client, created on first use"""
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(MONGODB_URL, event_listeners=[pool_monitor], **POOL_OPTIONS)
+    return client
 
 async def get_database():
+    return get_client()[DB_NAME]
+
+# Indexes the queries in this module rely on, by collection. Created at startup;
+# creating an index that already exists with the same options is a no-op.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("google_id", ASCENDING)], name="google_id", sparse=True),
+    ],
+    "decks": [
+        # find({"user_id"}) sorted by _id, and count_documents({"user_id"})
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id__id"),
+        # At most one default deck per user, even when two requests create it at once
+        IndexModel(
+            [("user_id", ASCENDING), ("is_default", ASCENDING)],
+            name="user_id_is_default",
+            unique=True,
+            partialFilterExpression={"is_default": True},
+        ),
+    ],
+}
+
+async def ensure_indexes(database):
+    """Create the INDEXES; a failing index is logged and does not stop startup"""
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await database[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                # e.g. duplicate default decks already stored, or an index with the same name and other options
+                logger.error(f"Could not create index {collection_name}.{index.document['name']}: {str(e)}")
+
+async def init_db():
+    global db
     try:
-        client = AsyncIOMotorClient(MONGODB_URL)   
-        await client.admin.command('ping')
-        return client[DB_NAME]
+        database = await get_database()
+        # Each concurrent ping checks out its own connection
+        await asyncio.gather(*[
+            database.command("ping") for _ in range(max(1, MONGO_WARM_CONNECTIONS))
+        ])
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
         raise
-
-async def init_db():
-    global db
-    db = await get_database()
+    db = database
+    await ensure_indexes(db)
+
+async def close_db():
+    global client, db
+    if client is not None:
+        client.close()
+    client = None
+    db = None
+
+def pool_stats() -> dict:
+    if client is None:
+        return {"connected": False, "servers": {}}
+    pool_options = client.options.pool_options
+    return {
+        "connected": True,
+        "max_pool_size": pool_options.max_pool_size,
+        "min_pool_size": pool_options.min_pool_size,
+        "servers": pool_monitor.stats(),
+    }
 
 async def get_collection(collection_name):
     """Centralized function to get a collection from the database"""
@@ -113,11 +281,9 @@ async def create_user_by_google(google_id: str, email: str, name: str = "", pict
             "decks": []
         }
         
-        # Insert the new user
-        result = await collection.insert_one(user_data)
-        
-        # Return the newly created user
-        return await get_user_by_id(result.inserted_id)
+        # Insert the new user, insert_one adds its _id
+        await collection.insert_one(user_data)
+        return user_data
         
     except Exception as e:
         logger.error(f"Error in create_user_via_google: {str(e)}")
@@ -141,13 +307,11 @@ async def create_user(user_data):
             
         if custom_id:
             user_copy["_id"] = custom_id
-            result = await collection.insert_one(user_copy)
-        else:
-            result = await collection.insert_one(user_copy)
+        # insert_one adds the _id when there is no custom one
+        result = await collection.insert_one(user_copy)
         
-        new_user = await collection.find_one({"_id": custom_id or result.inserted_id})
-        logger.info(f"User created successfully: {user_copy.get('email')} with ID: {custom_id or result.inserted_id}")
-        return new_user
+        logger.info(f"User created successfully: {user_copy.get('email')} with ID: {result.inserted_id}")
+        return user_copy
     except DuplicateKeyError:
         logger.warning(f"User already exists with this ID or unique field")
         if "_id" in user_data:
@@ -158,10 +322,10 @@ async def create_user(user_data):
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
 
-async def get_deck(deck_id: str):
+async def get_deck(deck_id: str, projection: dict = None):
     try:
         collection = await get_decks_collection()
-        deck = await collection.find_one({"_id": to_object_id(deck_id)})
+        deck = await collection.find_one({"_id": to_object_id(deck_id)}, projection)
         return deck
     except Exception as e:
         logger.error(f"Error getting deck: {str(e)}")
@@ -179,9 +343,9 @@ async def create_deck(deck_data: dict):
             deck_data["updated_at"] = timestamp
             
         collection = await get_decks_collection()
-        result = await collection.insert_one(deck_data)
-        deck = await collection.find_one({"_id": result.inserted_id})
-        return deck
+        # insert_one adds the _id, so deck_data is now the stored deck
+        await collection.insert_one(deck_data)
+        return deck_data
     except Exception as e:
         logger.error(f"Error creating deck: {str(e)}")
         raise
@@ -203,11 +367,11 @@ async def update_deck(deck_id: str, update_data: dict):
                 update_data = {"$set": update_data}
             update_data.setdefault("$set", {})["updated_at"] = get_timestamp()
                 
-        await collection.update_one(
+        deck = await collection.find_one_and_update(
             {"_id": to_object_id(deck_id)},
-            update_data
+            update_data,
+            return_document=ReturnDocument.AFTER
         )
-        deck = await get_deck(deck_id)
         return deck
     except Exception as e:
         logger.error(f"Error updating deck: {str(e)}")
@@ -235,9 +399,9 @@ async def create_flashcard(flashcard_data: dict):
             flashcard_data["deck_id"] = to_object_id(flashcard_data.pop("temp_deck_id"))
             
         collection = await get_flashcards_collection()
-        result = await collection.insert_one(flashcard_data)
-        flashcard = await collection.find_one({"_id": result.inserted_id})
-        return flashcard
+        # insert_one adds the _id, so flashcard_data is now the stored flashcard
+        await collection.insert_one(flashcard_data)
+        return flashcard_data
     except Exception as e:
         logger.error(f"Error creating flashcard: {str(e)}")
         raise
@@ -251,6 +415,27 @@ async def get_flashcard(flashcard_id: str):
         logger.error(f"Error getting flashcard: {str(e)}")
         raise
 
+async def get_flashcards_by_ids(card_ids: list, projection: dict = None):
+    """
+    Fetch many flashcards in one round trip, returned in the order of card_ids.
+    Ids without a flashcard are skipped, like the per-card lookups this replaces.
+    projection limits the returned fields, _id is always included.
+    """
+    try:
+        if not card_ids:
+            return []
+        object_ids = [to_object_id(card_id) for card_id in card_ids]
+        collection = await get_flashcards_collection()
+        unique_ids = list(set(object_ids))
+        # All of them in the first batch, the default of 101 documents would add getMores
+        found = await collection.find({"_id": {"$in": unique_ids}}, projection, batch_size=len(unique_ids)).to_list(length=None)
+        # $in returns documents in index order, put them back in deck order
+        by_id = {card["_id"]: card for card in found}
+        return [by_id[card_id] for card_id in object_ids if card_id in by_id]
+    except Exception as e:
+        logger.error(f"Error getting flashcards: {str(e)}")
+        raise
+
 async def update_flashcard(flashcard_id: str, update_data: dict):
     try:
         collection = await get_flashcards_collection()
@@ -260,11 +445,11 @@ async def update_flashcard(flashcard_id: str, update_data: dict):
             update_data = {"$set": update_data}
         update_data["$set"]["updated_at"] = get_timestamp()
         
-        await collection.update_one(
+        flashcard = await collection.find_one_and_update(
             {"_id": to_object_id(flashcard_id)},
-            update_data
+            update_data,
+            return_document=ReturnDocument.AFTER
         )
-        flashcard = await get_flashcard(flashcard_id)
         return flashcard
     except Exception as e:
         logger.error(f"Error updating flashcard: {str(e)}")
@@ -279,14 +464,140 @@ async def delete_flashcard(flashcard_id: str):
         logger.error(f"Error deleting flashcard: {str(e)}")
         raise
 
+# Most cards a deck holds, like models.Deck
+DECK_CARD_LIMIT = 1000
+
+# False once the server has refused a transaction (a standalone mongod)
+transactions_supported = True
+
+def _new_flashcards(deck_id, flashcards_data: list) -> list:
+    timestamp = get_timestamp()
+    flashcards = []
+    for flashcard_data in flashcards_data:
+        flashcard = dict(flashcard_data)
+        # The server assigns the ObjectId that decks reference; a client's _id would
+        # be stored as a str and never match the deck's cards
+        flashcard.pop("_id", None)
+        flashcard.setdefault("created_at", timestamp)
+        flashcard.setdefault("updated_at", timestamp)
+        flashcard["deck_id"] = deck_id
+        flashcards.append(flashcard)
+    return flashcards
+
+async def _attach(deck_id, flashcards: list, session=None):
+    decks_collection = await get_decks_collection()
+    return await decks_collection.find_one_and_update(
+        # The deck must have room for all the cards
+        {"_id": deck_id, f"cards.{DECK_CARD_LIMIT - len(flashcards)}": {"$exists": False}},
+        {
+            "$push": {"cards": {"$each": [flashcard["_id"] for flashcard in flashcards]}},
+            "$set": {"updated_at": get_timestamp()},
+        },
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+
+async def _insert_and_attach(flashcards: list, deck_id, session=None):
+    flashcards_collection = await get_flashcards_collection()
+    await flashcards_collection.insert_many(flashcards, session=session)
+    return await _attach(deck_id, flashcards, session)
+
+async def create_flashcards_in_deck(deck_id: str, flashcards_data: list):
+    """
+    Insert flashcards and append them to a deck, all or nothing: one insert_many and
+    one $push inside a transaction. Without transaction support (a standalone server)
+    the cards are deleted again if the deck can't take them.
+
+    Returns the created flashcards, or None if the deck doesn't exist or would hold
+    more than DECK_CARD_LIMIT cards.
+    """
+    global transactions_supported
+    try:
+        if not flashcards_data:
+            return []
+        if len(flashcards_data) > DECK_CARD_LIMIT:
+            return None
+        deck_id = to_object_id(deck_id)
+        flashcards = _new_flashcards(deck_id, flashcards_data)
+
+        if transactions_supported:
+            try:
+                async with await get_client().start_session() as session:
+                    async def attach(session):
+                        deck = await _insert_and_attach(flashcards, deck_id, session)
+                        if deck is None:
+                            # Rolls back the insert
+                            raise LookupError(deck_id)
+                        return deck
+                    # Retries on transient errors, e.g. a write conflict on the deck
+                    await session.with_transaction(attach)
+                return flashcards
+            except LookupError:
+                return None
+            except OperationFailure as e:
+                # IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+                if e.code != 20:
+                    raise
+                logger.warning("The database does not support transactions, attaching flashcards without one")
+                transactions_supported = False
+
+        deck = await _insert_and_attach(flashcards, deck_id)
+        if deck is None:
+            flashcards_collection = await get_flashcards_collection()
+            await flashcards_collection.delete_many({"_id": {"$in": [flashcard["_id"] for flashcard in flashcards]}})
+            return None
+        return flashcards
+    except Exception as e:
+        logger.error(f"Error creating flashcards in deck: {str(e)}")
+        raise
+
+async def import_flashcards(deck_id: str, flashcards_data: list):
+    """
+    Insert a batch of imported flashcards with one unordered insert_many, so a card
+    the server rejects doesn't stop the others, then append the inserted ones to the
+    deck with one $push.
+
+    Returns (created flashcards, {position in flashcards_data: error message}), or
+    None if the deck doesn't exist or has no room for the batch.
+    """
+    try:
+        if not flashcards_data:
+            return [], {}
+        deck_id = to_object_id(deck_id)
+        flashcards = _new_flashcards(deck_id, flashcards_data)
+        collection = await get_flashcards_collection()
+        failed = {}
+        try:
+            await collection.insert_many(flashcards, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        created = [flashcard for i, flashcard in enumerate(flashcards) if i not in failed]
+        if created and await _attach(deck_id, created) is None:
+            await collection.delete_many({"_id": {"$in": [flashcard["_id"] for flashcard in created]}})
+            return None
+        return created, failed
+    except Exception as e:
+        logger.error(f"Error importing flashcards: {str(e)}")
+        raise
+
+async def iter_deck_flashcards(deck: dict, batch_size: int = 500):
+    """
+    Yield a deck's flashcards in deck order, fetching batch_size of them per query,
+    so exporting a deck holds one batch in memory at a time.
+    """
+    card_ids = deck.get("cards") or []
+    for start in range(0, len(card_ids), batch_size):
+        for flashcard in await get_flashcards_by_ids(card_ids[start:start + batch_size]):
+            yield flashcard
+
 async def get_user_by_id(user_id: ObjectId):
     """Get a user by their ID"""
     try:
-        logger.info(f"Looking for user with ID: {user_id}")
+        logger.debug(f"Looking for user with ID: {user_id}")
         collection = await get_users_collection()
         user = await collection.find_one({"_id": user_id})
         if user:
-            logger.info(f"Found user with ID: {user.get('_id')}")
+            logger.debug(f"Found user with ID: {user.get('_id')}")
             return user
             
         logger.info(f"User not found with ID: {user_id}")
@@ -295,33 +606,78 @@ async def get_user_by_id(user_id: ObjectId):
         logger.error(f"Error finding user by ID: {str(e)}")
         raise
 
-async def get_user_decks(user_id: str):
-    """Get all decks for a user"""
+async def get_cached_user(user_id: str):
+    """get_user_by_id through user_cache; unknown users are not cached"""
+    user = user_cache.get(user_id)
+    if user is None:
+        generation = user_cache_generation
+        user = await get_user_by_id(user_id)
+        if user and generation == user_cache_generation:
+            user_cache.set(user_id, user)
+    return user
+
+def invalidate_cached_user(user_id: str):
+    """Drop a user's cache entry after a write to them, see user_cache_generation"""
+    global user_cache_generation
+    user_cache_generation += 1
+    user_cache.delete(user_id)
+
+async def get_user_decks(user_id: str, limit: int = 100, after: str = None, projection: dict = None):
+    """
+    Get a page of a user's decks in creation (_id) order.
+    after is the _id of the last deck of the previous page, projection limits the returned fields.
+    """
     try:
         collection = await get_decks_collection()
-        user_decks = await collection.find({"user_id": user_id}).to_list(length=100)
+        query = {"user_id": user_id}
+        if after is not None:
+            query["_id"] = {"$gt": to_object_id(after)}
+        cursor = collection.find(query, projection).sort("_id", 1).limit(limit)
+        user_decks = await cursor.to_list(length=limit)
         return user_decks
     except Exception as e:
         logger.error(f"Error getting user decks: {str(e)}")
         raise
 
-async def get_or_create_user_default_deck(user_id: str):
-    """Get a user's default deck or create one if it doesn't exist"""
+async def count_user_decks(user_id: str) -> int:
+    """Number of decks a user has"""
+    try:
+        collection = await get_decks_collection()
+        return await collection.count_documents({"user_id": user_id})
+    except Exception as e:
+        logger.error(f"Error counting user decks: {str(e)}")
+        raise
+
+async def find_user_default_deck(user_id: str, projection: dict = None):
+    """
+    Get a user's default deck, or None if it hasn't been created yet.
+    For read-only routes, which must not create it; projection limits the returned fields.
+    """
+    try:
+        collection = await get_decks_collection()
+        return await collection.find_one({"user_id": user_id, "is_default": True}, projection)
+    except Exception as e:
+        logger.error(f"Error getting default deck: {str(e)}")
+        raise
+
+async def get_or_create_user_default_deck(user_id: str, user: dict = None):
+    """
+    Get a user's default deck or create one if it doesn't exist.
+    user is the user's document if the caller has it, it names a new deck.
+    """
     try:
         collection = await get_decks_collection()
         
         # Try to find a default deck for the user
-        default_deck = await collection.find_one({
-            "user_id": user_id,
-            "is_default": True
-        })
+        default_deck = await find_user_default_deck(user_id)
         
         # If default deck exists, return it
         if default_deck:
             return default_deck
         
         # Get user info to personalize deck name if possible    
-        user = await get_user_by_id(user_id)
+        if user is None:
+            user = await get_user_by_id(user_id)
         deck_name = f"{user['name']}'s Flashcards" if user and 'name' in user else "My Flashcards"
             
         # If no default deck, create one
@@ -336,11 +692,14 @@ async def get_or_create_user_default_deck(user_id: str):
             "updated_at": timestamp
         }
         
-        result = await collection.insert_one(new_deck)
-        created_deck = await collection.find_one({"_id": result.inserted_id})
+        try:
+            await collection.insert_one(new_deck)
+        except DuplicateKeyError:
+            # Another request created it first, see the user_id_is_default index
+            return await collection.find_one({"user_id": user_id, "is_default": True})
         
-        logger.info(f"Created default deck for user {user_id}: {deck_name} ({result.inserted_id})")
-        return created_deck
+        logger.info(f"Created default deck for user {user_id}: {deck_name} ({new_deck['_id']})")
+        return new_deck
     except Exception as e:
         logger.error(f"Error with default deck: {str(e)}")
         raise
@@ -355,14 +714,13 @@ async def update_user(user_id: str, update_data: dict):
             update_data = {"$set": update_data}
         update_data["$set"]["updated_at"] = get_timestamp()
             
-        # Update user document
-        await collection.update_one(
+        # Update user document and return the updated user
+        updated_user = await collection.find_one_and_update(
             {"_id": user_id},
-            update_data
+            update_data,
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Return updated user
-        updated_user = await get_user_by_id(user_id)
+        invalidate_cached_user(user_id)
         return updated_user
     except Exception as e:
         logger.error(f"Error updating user: {str(e)}")
@@ -410,8 +768,7 @@ async def get_or_create_user(user_id: str, email: str, name: str = "", picture:
                 
             # Update if needed
             if update_needed:
-                await update_user(user_id, updates)
-                user = await get_user_by_id(user_id)
+                user = await update_user(user_id, updates)
                 
             return user
         
@@ -438,11 +795,10 @@ async def get_or_create_user(user_id: str, email: str, name: str = "", picture:
             "decks": []
         }
         
-        # Insert the new user
-        result = await collection.insert_one(user_data)
-        
-        # Return the newly created user
-        return await get_user_by_id(user_id)
+        # Insert the new user, which is then the stored document
+        await collection.insert_one(user_data)
+        invalidate_cached_user(user_id)
+        return user_data
         
     except Exception as e:
         logger.error(f"Error in get_or_create_user: {str(e)}")
@@ -462,9 +818,8 @@ async def get_user_flashcards_direct(user_id: str):
             logger.warning(f"User not found with ID: {user_id}")
             return []
             
-        # Get database collections
+        # Get database collection
         decks_collection = await get_decks_collection()
-        flashcards_collection = await get_flashcards_collection()
         
         # First get the user's default deck
         default_deck = await decks_collection.find_one({
@@ -487,13 +842,8 @@ async def get_user_flashcards_direct(user_id: str):
         
         logger.info(f"Found default deck with {len(default_deck['cards'])} cards")
         
-        # Convert card IDs to ObjectIds for query
-        object_ids = [to_object_id(card_id) for card_id in default_deck["cards"]]
-        
-        # Use $in operator to fetch all cards in a single query
-        flashcards = await flashcards_collection.find(
-            {"_id": {"$in": object_ids}}
-        ).to_list(length=None)
+        # Fetch all cards in a single query, in deck order
+        flashcards = await get_flashcards_by_ids(default_deck["cards"])
         
         logger.info(f"Retrieved {len(flashcards)} flashcards for user {user_id}")
         return flashcards
@@ -517,31 +867,15 @@ async def create_user_flashcard_direct(user_id: str, flashcard_data: dict):
             return None
         
         # Get the user's default deck or create it
-        default_deck = await get_or_create_user_default_deck(user_id)
+        default_deck = await get_or_create_user_default_deck(user_id, user)
             
-        # Now create the flashcard
+        # Now create the flashcard and add it to the deck
         logger.info(f"Creating flashcard in deck: {default_deck['_id']}")
-        
-        # Add timestamps if not present
-        timestamp = get_timestamp()
-        if "created_at" not in flashcard_data:
-            flashcard_data["created_at"] = timestamp
-        if "updated_at" not in flashcard_data:
-            flashcard_data["updated_at"] = timestamp
-        
-        # Add deck_id to the flashcard
-        flashcard_data["deck_id"] = default_deck["_id"]
-            
-        # Create the flashcard
-        flashcards_collection = await get_flashcards_collection()
-        result = await flashcards_collection.insert_one(flashcard_data)
-        created_card = await flashcards_collection.find_one({"_id": result.inserted_id})
-        
-        # Add the flashcard ID to the default deck
-        await update_deck(
-            str(default_deck["_id"]), 
-            {"$push": {"cards": created_card["_id"]}}
-        )
+        created_cards = await create_flashcards_in_deck(default_deck["_id"], [flashcard_data])
+        if created_cards is None:
+            logger.warning(f"Default deck {default_deck['_id']} of user {user_id} is full")
+            return None
+        created_card = created_cards[0]
         
         logger.info(f"Successfully created flashcard {created_card['_id']} for user {user_id}")
         return created_card
@@ -549,4 +883,63 @@ async def create_user_flashcard_direct(user_id: str, flashcard_data: dict):
     except Exception as e:
         logger.error(f"Error in create_user_flashcard_direct: {str(e)}")
         raise
-    
\ No newline at end of file
+
+# Shapes of the queries in this module, with placeholder values, for explain_queries
+QUERY_SHAPES = [
+    ("users", "get_user_by_id", {"_id": "user-id"}, None),
+    ("users", "get_user_by_email", {"email": "user@example.com"}, None),
+    ("users", "get_user_by_google", {"google_id": "google-id"}, None),
+    ("decks", "get_deck", {"_id": ObjectId()}, None),
+    ("decks", "get_user_decks", {"user_id": "user-id"}, [("_id", ASCENDING)]),
+    ("decks", "get_user_decks (next page)", {"user_id": "user-id", "_id": {"$gt": ObjectId()}}, [("_id", ASCENDING)]),
+    ("decks", "count_user_decks", {"user_id": "user-id"}, None),
+    ("decks", "find_user_default_deck", {"user_id": "user-id", "is_default": True}, None),
+    ("flashcards", "get_flashcard", {"_id": ObjectId()}, None),
+    ("flashcards", "get_flashcards_by_ids", {"_id": {"$in": [ObjectId(), ObjectId()]}}, None),
+]
+
+def _plan_stages(plan):
+    """Every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+async def explain_queries() -> list:
+    """
+    Run explain() on every query shape in QUERY_SHAPES.
+    Returns (collection, query name, winning plan stages, uses a collection scan) tuples.
+    """
+    database = db if db is not None else await get_database()
+    results = []
+    for collection_name, name, query, sort in QUERY_SHAPES:
+        cursor = database[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        stages = list(_plan_stages(plan))
+        results.append((collection_name, name, stages, "COLLSCAN" in stages))
+    return results
+
+if __name__ == "__main__":
+    # Diagnostic: python database.py [--create-indexes]
+    import sys
+
+    async def main():
+        database = await get_database()
+        if "--create-indexes" in sys.argv:
+            await ensure_indexes(database)
+        scans = 0
+        for collection_name, name, stages, collection_scan in await explain_queries():
+            scans += collection_scan
+            flag = "COLLSCAN" if collection_scan else "ok"
+            print(f"{flag:9} {collection_name}.{name}: {' <- '.join(stages)}")
+        print(f"{scans} quer{'y' if scans == 1 else 'ies'} scanning a whole collection")
+        await close_db()
+        return scans
+
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("dictionaries")
+
+
+class UnknownLanguage(KeyError):
+    pass
+
+
+async def _tokenize_in_thread(dictionary, text: str) -> list:
+    return await asyncio.to_thread(dictionary.tokenize, text)
+
+
+class _Language:
+    __slots__ = ("code", "load", "tokenize", "pinned", "dictionary", "loading", "size", "last_used")
+
+    def __init__(self, code, load, tokenize, pinned):
+        self.code = code
+        self.load = load
+        self.tokenize = tokenize
+        self.pinned = pinned
+        self.dictionary = None
+        self.loading = None
+        self.size = 0
+        self.last_used = 0.0
+
+
+class DictionaryRegistry:
+    """
+        Dictionaries keyed by language code, loaded on first use. When the loaded
+        dictionaries exceed memory_budget bytes, the least recently used ones that
+        are not pinned are dropped and reload on their next use.
+
+        A dictionary's size is its memory_size() if it has one (for snapshot-backed
+        dictionaries, the mapped snapshot), else 0. Not thread-safe: use it from the
+        event loop.
+
+    Args:
+        memory_budget (int): Most bytes of loaded dictionaries, None for no limit
+    """
+
+    def __init__(self, memory_budget: int = None):
+        self.memory_budget = memory_budget
+        self.languages = {}
+
+    def register(self, code: str, load, tokenize=None, pinned: bool = False):
+        """
+        Args:
+            code (str): Language code used in routes, e.g. "cn"
+            load: async callable returning the loaded dictionary
+            tokenize: async callable (dictionary, text) -> list of tokens, defaults
+                to dictionary.tokenize in a worker thread
+            pinned (bool): Never evict this language
+        """
+        self.languages[code] = _Language(code, load, tokenize or _tokenize_in_thread, pinned)
+
+    def _language(self, code: str) -> _Language:
+        language = self.languages.get(code)
+        if(language is None):
+            raise UnknownLanguage(code)
+        return language
+
+    def loaded(self, code: str):
+        """
+            The dictionary of code if it is loaded, without loading it.
+        """
+        return self._language(code).dictionary
+
+    def pinned_missing(self) -> list:
+        """
+            Codes of the pinned languages whose dictionary is not loaded (yet).
+        """
+        return [code for code, language in self.languages.items() if language.pinned and language.dictionary is None]
+
+    async def get(self, code: str):
+        """
+            The dictionary of code, loading it first if needed. Concurrent callers
+            share a single load.
+
+        Raises:
+            UnknownLanguage: code is not registered
+        """
+        language = self._language(code)
+        if(language.dictionary is None):
+            if(language.loading is None):
+                language.loading = asyncio.ensure_future(self._load(language))
+            # A cancelled request must not cancel the load other requests wait on
+            await asyncio.shield(language.loading)
+        language.last_used = time.monotonic()
+        return language.dictionary
+
+    async def tokenize(self, code: str, text: str) -> list:
+        language = self._language(code)
+        return await language.tokenize(await self.get(code), text)
+
+    async def _load(self, language: _Language):
+        try:
+            start = time.perf_counter()
+            self.replace(language.code, await language.load())
+            logger.info("Dictionary %s loaded (%d bytes). Took %.3fs.", language.code, language.size, time.perf_counter() - start)
+        finally:
+            language.loading = None
+
+    def replace(self, code: str, dictionary):
+        """
+            Install dictionary for code, e.g. after a reload, then enforce the budget.
+        """
+        language = self._language(code)
+        language.dictionary = dictionary
+        memory_size = getattr(dictionary, "memory_size", None)
+        language.size = memory_size() if memory_size is not None else 0
+        language.last_used = time.monotonic()
+        self._enforce_budget(keep=code)
+
+    def evict(self, code: str):
+        language = self._language(code)
+        language.dictionary = None
+        language.size = 0
+
+    def memory_size(self) -> int:
+        return sum(language.size for language in self.languages.values())
+
+    def _enforce_budget(self, keep: str):
+        if(self.memory_budget is None):
+            return
+        candidates = sorted(
+            (language for language in self.languages.values()
+             if language.dictionary is not None and not language.pinned and language.code != keep),
+            key=lambda language: language.last_used,
+        )
+        for language in candidates:
+            if(self.memory_size() <= self.memory_budget):
+                break
+            logger.info("Evicting dictionary %s (%d bytes) to stay within budget.", language.code, language.size)
+            self.evict(language.code)
+
+    def stats(self) -> dict:
+        return {
+            "memory_budget": self.memory_budget,
+            "memory_size": self.memory_size(),
+            "languages": {
+                code: {
+                    "loaded": language.dictionary is not None,
+                    "loading": language.loading is not None,
+                    "pinned": language.pinned,
+                    "size": language.size,
+                }
+                for code, language in self.languages.items()
+            },
+        }
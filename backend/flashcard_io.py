@@ -0,0 +1,186 @@
+import codecs
+import csv
+import io
+import json
+
+# Export/import formats and their media types
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    # Anki's "Notes in Plain Text" import: tab-separated with # header lines
+    "anki": "text/tab-separated-values",
+}
+EXTENSIONS = {"ndjson": "ndjson", "csv": "csv", "anki": "txt"}
+
+FIELDS = ("term", "reading", "definition")
+# Joins the syllable readings in csv and anki rows, like the frontend's ruby text
+READING_SEPARATOR = ";"
+
+
+class RowError(ValueError):
+    pass
+
+
+class TooLarge(ValueError):
+    pass
+
+
+def _flat(card: dict) -> list:
+    reading = card.get("reading") or []
+    if(not isinstance(reading, str)):
+        reading = READING_SEPARATOR.join(reading)
+    return [card.get("term", ""), reading, card.get("definition", "")]
+
+
+def _unflat(values: list) -> dict:
+    if(len(values) < len(FIELDS)):
+        raise RowError(f"expected {len(FIELDS)} columns ({', '.join(FIELDS)}), got {len(values)}")
+    term, reading, definition = values[:len(FIELDS)]
+    return {
+        "term": term.strip(),
+        "reading": [syllable.strip() for syllable in reading.split(READING_SEPARATOR) if syllable.strip()],
+        "definition": definition.strip(),
+    }
+
+
+def _csv_line(values: list) -> str:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerow(values)
+    return out.getvalue()
+
+
+def header(format: str) -> str:
+    """
+        Text preceding the rows of an export.
+    """
+    if(format == "csv"):
+        return _csv_line(list(FIELDS))
+    if(format == "anki"):
+        return "#separator:tab\n#html:false\n#columns:" + "\t".join(FIELDS) + "\n"
+    return ""
+
+
+def serialize(card: dict, format: str) -> str:
+    """
+        One exported line of a flashcard document.
+    """
+    if(format == "ndjson"):
+        return json.dumps({field: card.get(field) for field in FIELDS}, ensure_ascii=False) + "\n"
+    if(format == "csv"):
+        return _csv_line(_flat(card))
+    # Anki fields can't hold tabs or newlines without html
+    return "\t".join(" ".join(value.split()) for value in _flat(card)) + "\n"
+
+
+async def _lines(chunks):
+    """
+        Lines of a utf-8 byte stream, decoded as they arrive.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if(pending):
+        yield pending.rstrip("\r")
+
+
+async def capped(chunks, max_bytes: int):
+    """
+        Pass a byte stream through, raising TooLarge once more than max_bytes arrived.
+        Rows read before then are whole: the cut-off chunk is never parsed.
+    """
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if(max_bytes < received):
+            raise TooLarge(f"Request body is larger than {max_bytes} bytes")
+        yield chunk
+
+
+async def _records(lines):
+    """
+        Join lines into csv records, whose quoted fields may span lines.
+        Yields (line number of the record's start, text).
+    """
+    record = None
+    start = 0
+    number = 0
+    async for line in lines:
+        number += 1
+        if(record is None):
+            record, start = line, number
+        else:
+            record += "\n" + line
+        if(record.count('"') % 2 == 0):
+            yield start, record
+            record = None
+    if(record is not None):
+        yield start, record
+
+
+async def read_rows(chunks, format: str):
+    """
+        Parse an import stream one row at a time, so memory doesn't grow with its size.
+        csv needs a header row naming the columns; anki rows are term, reading,
+        definition after any # header lines; ndjson rows are objects with those keys.
+
+    Args:
+        chunks: async iterable of bytes, e.g. Request.stream()
+
+    Yields:
+        (int, dict or RowError): line number and the row's fields, or why it can't be read
+    """
+    if(format == "ndjson"):
+        number = 0
+        async for line in _lines(chunks):
+            number += 1
+            if(not line.strip()):
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, RowError(f"invalid JSON: {e}")
+                continue
+            if(not isinstance(row, dict)):
+                yield number, RowError("expected a JSON object")
+                continue
+            # Other keys, e.g. an _id from another server, are not the importer's to set
+            row = {field: row[field] for field in FIELDS if field in row}
+            if(isinstance(row.get("reading"), str)):
+                row["reading"] = _unflat(["", row["reading"], ""])["reading"]
+            yield number, row
+        return
+
+    if(format == "anki"):
+        number = 0
+        async for line in _lines(chunks):
+            number += 1
+            if(not line.strip() or line.startswith("#")):
+                continue
+            try:
+                yield number, _unflat(line.split("\t"))
+            except RowError as e:
+                yield number, e
+        return
+
+    columns = None
+    async for number, record in _records(_lines(chunks)):
+        if(not record.strip()):
+            continue
+        values = next(csv.reader([record]), [])
+        if(columns is None):
+            columns = [value.strip().lower() for value in values]
+            missing = [field for field in FIELDS if field not in columns]
+            if(missing):
+                yield number, RowError(f"header is missing {', '.join(missing)}")
+                return
+            continue
+        values = [values[columns.index(field)] if columns.index(field) < len(values) else "" for field in FIELDS]
+        try:
+            yield number, _unflat(values)
+        except RowError as e:
+            yield number, e
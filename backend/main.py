@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Query, Depends, HTTPException, status, Request, Response
+from fastapi import FastAPI, Query, Depends, HTTPException, status, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 import jieba
 import uvicorn
 from typing import List, Dict, Optional
-from starlette.responses import RedirectResponse
+from starlette.responses import RedirectResponse, JSONResponse, StreamingResponse
 import os
 import logging
 import time
+import asyncio
+import codecs
+import json
+import multiprocessing
+import secrets
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -15,16 +23,23 @@ from slowapi.errors import RateLimitExceeded
 from bson.objectid import ObjectId
 
 import CDict
+import cache
+import dictionaries
+import flashcard_io
+import segmenter
+import segmenter_pool
 from contextlib import asynccontextmanager
-from models import User, Deck, Flashcard
+from pydantic import ValidationError
+from models import User, Deck, Flashcard, FlashcardBatch, AnnotateRequest
 from database import (
     create_deck, get_deck, update_deck, delete_deck,
-    create_flashcard, get_flashcard, update_flashcard, delete_flashcard,
-    get_user_by_email, create_user, init_db, get_user_decks,
-    get_or_create_user_default_deck, get_user_by_id
+    get_flashcards_by_ids, update_flashcard,
+    create_flashcards_in_deck, import_flashcards, iter_deck_flashcards, DECK_CARD_LIMIT,
+    get_user_by_email, create_user, init_db, close_db, pool_stats, get_user_decks, count_user_decks,
+    get_or_create_user_default_deck, find_user_default_deck, user_cache
 )
 from auth import (
-    get_current_user, get_optional_user, create_access_token,
+    get_current_user, get_reading_user, get_optional_user, create_access_token,
     get_google_auth_url, exchange_code_for_token, get_google_user_info, COOKIE_NAME
 )
 logging.basicConfig(
@@ -37,22 +52,253 @@ logging.basicConfig(
 logger = logging.getLogger("main")
 limiter = Limiter(key_func=get_remote_address)
 
+CEDICT_SNAPSHOT = "./data/cedict_ts.snapshot"
+CEDICT_SOURCE = "./data/cedict_ts.txt"
+
+# /tokenize/cn/stream segments once STREAM_CHUNK_SIZE characters have arrived and
+# refuses bodies over TOKENIZE_STREAM_MAX_BYTES with 413
+STREAM_CHUNK_SIZE = 1 << 16
+STREAM_MAX_BYTES = int(os.getenv("TOKENIZE_STREAM_MAX_BYTES", str(64 << 20)))
+
 c_dict : CDict.CDict = None
+jieba_tokenizer : jieba.Tokenizer = None
+# Serializes dictionary reloads, created in lifespan
+reload_lock : asyncio.Lock = None
+
+# Dictionaries by language, loaded on first use. DICTIONARY_MEMORY_BUDGET_MB bounds the
+# mapped size of the loaded ones (0 = no limit); "cn" is loaded at startup and pinned.
+registry = dictionaries.DictionaryRegistry(
+    memory_budget=int(float(os.getenv("DICTIONARY_MEMORY_BUDGET_MB", "0")) * (1 << 20)) or None
+)
+
+# Seconds between checks of the CC-CEDICT source for changes, 0 disables the watcher
+DICTIONARY_WATCH_INTERVAL = float(os.getenv("DICTIONARY_WATCH_INTERVAL", "0"))
+# Token for the /admin endpoints, which are disabled when it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Segmentation runs in this pool so long texts can't block the event loop.
+# TOKENIZE_EXECUTOR is "thread" or "process" (each process preloads the dictionaries).
+tokenize_pool = segmenter_pool.SegmenterPool(
+    mode=os.getenv("TOKENIZE_EXECUTOR", "thread"),
+    workers=int(os.getenv("TOKENIZE_WORKERS", "2")),
+    queue_depth=int(os.getenv("TOKENIZE_QUEUE_DEPTH", "32")),
+)
+
+# Serialized responses of /tokenize/cn, /term/cn, /search and /suggest, keyed by query
+CACHE_TTL = float(os.getenv("CACHE_TTL_SECONDS", "0"))
+CACHE_POLICY = os.getenv("CACHE_POLICY", "lru")
+tokenize_cache = cache.Cache(
+    "tokenize", max_size=int(os.getenv("TOKENIZE_CACHE_SIZE", "4096")), ttl=CACHE_TTL, policy=CACHE_POLICY
+)
+term_cache = cache.Cache(
+    "term", max_size=int(os.getenv("TERM_CACHE_SIZE", "16384")), ttl=CACHE_TTL, policy=CACHE_POLICY
+)
+search_cache = cache.Cache(
+    "search", max_size=int(os.getenv("SEARCH_CACHE_SIZE", "4096")), ttl=CACHE_TTL, policy=CACHE_POLICY
+)
+
+TERM_CACHE_CONTROL = "public, max-age=86400"
+
+def json_bytes(content) -> bytes:
+    """Encode content the way JSONResponse does, so cached bodies match uncached ones"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+async def load_chinese() -> CDict.CDict:
+    """
+    Load CDict and jieba in worker threads so the event loop keeps serving meanwhile.
+    Returns the loaded CDict if everything is up already, e.g. after an eviction.
+    """
+    if c_dict is not None and jieba_tokenizer is not None and tokenize_pool.executor is not None:
+        return c_dict
+
+    async def load_cdict():
+        global c_dict
+        try:
+            c_dict = await compile_dictionary()
+        except Exception as e:
+            # Serve the last snapshot that passed validation, if there is one
+            logger.error(f"Dictionary sources rejected, loading the current snapshot: {str(e)}")
+            c_dict = await asyncio.to_thread(CDict.CDict.from_snapshot, CEDICT_SNAPSHOT)
+
+    async def load_jieba():
+        global jieba_tokenizer
+        # jieba segments with the CC-CEDICT-reduced dictionary, so every multi-character
+        # token it produces has a /term/cn entry. Its prefix dict is cached in data/.
+        jieba_tokenizer = await asyncio.to_thread(segmenter.load_jieba)
+
+    await asyncio.gather(load_cdict(), load_jieba())
+    # Retire the workers of an earlier attempt that failed after starting them
+    tokenize_pool.shutdown()
+    # The snapshot on disk is validated by now, workers load it as is
+    await tokenize_pool.start(c_dict, jieba_tokenizer, CEDICT_SNAPSHOT, None)
+    return c_dict
+
+async def tokenize_chinese_text(dictionary: CDict.CDict, text: str) -> list:
+    # /tokenize/cn has always been jieba's full mode, CDict only looks the tokens up
+    return await tokenize_pool.cut(text, cut_all=True)
+
+registry.register("cn", load_chinese, tokenize=tokenize_chinese_text, pinned=True)
+
+async def load_dictionaries():
+    """Preload the dictionaries that are pinned in the registry"""
+    try:
+        await asyncio.gather(*(registry.get(code) for code, language in registry.languages.items() if language.pinned))
+        logger.info("Dictionaries ready")
+    except Exception as e:
+        # Stay not-ready; /ready keeps reporting which component is missing
+        logger.error(f"Error loading dictionaries: {str(e)}")
+
+def validate_dictionary(candidate: CDict.CDict):
+    """Sanity checks a freshly loaded CDict must pass before it replaces the live one"""
+    if candidate.snapshot.entry_count == 0 or candidate.snapshot.headword_count == 0:
+        raise ValueError("Dictionary is empty")
+    headword = candidate.snapshot.headword(0)
+    if not candidate.search(headword) or not candidate.tokenize_spans(headword):
+        raise ValueError(f"Dictionary cannot look up its own headword {headword}")
+
+async def compile_dictionary(builder=None) -> CDict.CDict:
+    """
+    Load the CC-CEDICT snapshot, rebuilding it first if its sources changed.
+    A rebuilt snapshot is written beside the live one and only replaces it once
+    validate_dictionary accepts it, so process workers, other uvicorn workers and
+    restarts never load a snapshot built from a broken source.
+
+    Args:
+        builder: executor that builds the snapshot, the default thread pool if None
+    """
+    fd, candidate_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CEDICT_SNAPSHOT)), prefix=".snapshot-candidate-")
+    os.close(fd)
+    try:
+        loop = asyncio.get_running_loop()
+        built = await loop.run_in_executor(
+            builder, CDict.CDict.compile_snapshot, CEDICT_SNAPSHOT, CEDICT_SOURCE, segmenter.JIEBA_DICTIONARY, candidate_path
+        )
+        candidate = await asyncio.to_thread(CDict.CDict.from_snapshot, candidate_path if built else CEDICT_SNAPSHOT)
+        validate_dictionary(candidate)
+        if built:
+            # The candidate stays mapped through the rename
+            os.replace(candidate_path, CEDICT_SNAPSHOT)
+        return candidate
+    finally:
+        if os.path.exists(candidate_path):
+            os.unlink(candidate_path)
+
+async def reload_dictionary() -> dict:
+    """
+    Rebuild the CC-CEDICT snapshot if its sources changed, then load, validate and
+    swap in the new CDict and jieba. Requests already running finish on the old instances.
+    Only this process reloads: with several uvicorn workers, each one picks new
+    sources up through its own watcher (DICTIONARY_WATCH_INTERVAL).
+    """
+    global c_dict, jieba_tokenizer
+    async with reload_lock:
+        previous = c_dict
+        # Building is CPU-bound pure Python, keep it off this process' GIL
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as builder:
+            candidate = await compile_dictionary(builder)
+        # The version hashes dict.txt.reduced along with CC-CEDICT, so neither changed
+        if previous is not None and candidate.version == previous.version:
+            return {"reloaded": False, "version": previous.version}
+
+        tokenizer = await asyncio.to_thread(segmenter.load_jieba)
+        await tokenize_pool.reload(candidate, tokenizer, CEDICT_SNAPSHOT, None)
+        c_dict = candidate
+        jieba_tokenizer = tokenizer
+        registry.replace("cn", candidate)
+        # Cached bodies were rendered from the old dictionary
+        tokenize_cache.clear()
+        term_cache.clear()
+        search_cache.clear()
+        logger.info(f"Dictionary reloaded: version {candidate.version}")
+        return {
+            "reloaded": True,
+            "version": candidate.version,
+            "previous_version": None if previous is None else previous.version,
+        }
+
+def dictionary_sources_signature():
+    return tuple(
+        os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        for path in (CEDICT_SOURCE, segmenter.JIEBA_DICTIONARY)
+    )
+
+async def watch_dictionary():
+    """Reload the dictionary when its source files change on disk"""
+    seen = dictionary_sources_signature()
+    while True:
+        await asyncio.sleep(DICTIONARY_WATCH_INTERVAL)
+        current = dictionary_sources_signature()
+        if current == seen or c_dict is None:
+            continue
+        seen = current
+        try:
+            await reload_dictionary()
+        except Exception as e:
+            # Keep serving the current dictionary
+            logger.error(f"Dictionary reload failed: {str(e)}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global c_dict
+    global c_dict, jieba_tokenizer, reload_lock
     try:
         # Initialize database connection
         await init_db()
-        
-        # Load dictionaries
-        c_dict = CDict.CDict("./data/cedict_ts.txt")
-        # Using the default Jieba dictionary instead of a custom one
-        # jieba.set_dictionary('data/dict.txt.reduced')
     except Exception as e:
         raise
+
+    # Load dictionaries in the background; /ready reports when they are usable
+    reload_lock = asyncio.Lock()
+    loading = asyncio.create_task(load_dictionaries())
+    watching = asyncio.create_task(watch_dictionary()) if DICTIONARY_WATCH_INTERVAL > 0 else None
     yield
+    loading.cancel()
+    if watching is not None:
+        watching.cancel()
+    tokenize_pool.shutdown()
+    for code in registry.languages:
+        registry.evict(code)
     c_dict = None
+    jieba_tokenizer = None
+    await close_db()
+
+def dictionaries_loading() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Dictionaries are still loading",
+        headers={"Retry-After": "5"},
+    )
+
+def require_dictionaries():
+    """
+    Dependency for routes that need the dictionaries, 503 while they are loading.
+    Matches /ready, so a route is usable as soon as the probe says so.
+    """
+    if c_dict is None or jieba_tokenizer is None or tokenize_pool.executor is None or registry.pinned_missing():
+        raise dictionaries_loading()
+
+async def language_dictionary(lang: str):
+    """
+    Dependency resolving the {lang} path parameter, loads the dictionary on first use.
+    Pinned dictionaries are loaded at startup: until then requests get 503 right away
+    rather than waiting on, or retrying, that load.
+    """
+    language = registry.languages.get(lang)
+    if language is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown language \"{lang}\"")
+    if language.pinned:
+        dictionary = registry.loaded(lang)
+        if dictionary is None:
+            raise dictionaries_loading()
+        return dictionary
+    try:
+        return await registry.get(lang)
+    except Exception as e:
+        logger.error(f"Error loading dictionary {lang}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Dictionary {lang} is unavailable",
+            headers={"Retry-After": "5"},
+        )
 
 app = FastAPI(title="Language Learning API", lifespan=lifespan)
 
@@ -65,42 +311,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests and responses with relevant details"""
-    # Generate a unique ID for this request
-    import uuid
-    request_id = str(uuid.uuid4())
-    
-    # Log request details
-    logger.info(f"Request [{request_id}]: {request.method} {request.url.path}")
-    
-    # Log request headers (excluding sensitive information)
-    headers = dict(request.headers)
-    if "authorization" in headers:
-        headers["authorization"] = "Bearer [REDACTED]"
-    if "cookie" in headers:
-        headers["cookie"] = "[REDACTED]"
-    logger.debug(f"Request headers [{request_id}]: {headers}")
-    
-    # Process the request
-    try:
+# Add logging middleware. It wraps the ASGI app directly rather than through
+# @app.middleware("http"), whose response reads the request's messages while it
+# streams and so would starve /tokenize/cn/stream of its body.
+class RequestLoggingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Log all requests and responses with relevant details"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Generate a unique ID for this request
+        import uuid
+        request_id = str(uuid.uuid4())
+        request = Request(scope)
+
+        # Log request details
+        logger.info(f"Request [{request_id}]: {request.method} {request.url.path}")
+
+        # Log request headers (excluding sensitive information)
+        headers = dict(request.headers)
+        if "authorization" in headers:
+            headers["authorization"] = "Bearer [REDACTED]"
+        if "cookie" in headers:
+            headers["cookie"] = "[REDACTED]"
+        logger.debug(f"Request headers [{request_id}]: {headers}")
+
         start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        # Log response details
-        logger.info(f"Response [{request_id}]: {response.status_code} completed in {process_time:.4f}s")
-        return response
-    except Exception as e:
-        logger.error(f"Request [{request_id}] failed: {str(e)}")
-        raise
+
+        async def send_logged(message):
+            if message["type"] == "http.response.start":
+                # Log response details
+                process_time = time.time() - start_time
+                logger.info(f"Response [{request_id}]: {message['status']} completed in {process_time:.4f}s")
+            await send(message)
+
+        # Process the request
+        try:
+            await self.app(scope, receive, send_logged)
+        except Exception as e:
+            logger.error(f"Request [{request_id}] failed: {str(e)}")
+            raise
+
+app.add_middleware(RequestLoggingMiddleware)
 
 # Add rate limit error handler
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+async def _segmenter_busy_handler(request: Request, exc: segmenter_pool.SegmenterBusy):
+    """Shed load instead of queueing without bound when segmentation is saturated"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Tokenizer is busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+app.add_exception_handler(segmenter_pool.SegmenterBusy, _segmenter_busy_handler)
+
 # CORS configuration
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
@@ -111,24 +382,211 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],  # Can be more restrictive if needed
-    expose_headers=["X-Total-Count"],  # Only expose headers you need
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],  # Only expose headers you need
 )
 
-@app.get("/tokenize/cn")
+@app.get("/ready")
+async def readiness(response: Response):
+    """Readiness probe: 503 until CDict, the jieba segmenter and every pinned dictionary are loaded"""
+    components = {
+        "cdict": c_dict is not None,
+        "jieba": jieba_tokenizer is not None,
+        "segmenter_pool": tokenize_pool.executor is not None,
+        "dictionaries": not registry.pinned_missing(),
+    }
+    ready = all(components.values())
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    # Changes whenever the dictionary is reloaded with new data; clients can key caches on it
+    return {"ready": ready, **components, "cdict_version": None if c_dict is None else c_dict.version}
+
+@app.get("/tokenize/{lang}")
 @limiter.limit("20/minute")
-async def tokenize_chinese(
+async def tokenize_text(
     request: Request,
-    q: str = Query(..., description="Chinese text to tokenize", max_length=1000)
+    lang: str,
+    q: str = Query(..., description="Text to tokenize", max_length=1000),
+    dictionary = Depends(language_dictionary)
 ):
     q = q.replace(" ", "")
-    tokens = list(jieba.cut(q, cut_all=True))
-    return {"tokens": tokens}
+    key = (lang, q)
+    body = tokenize_cache.get(key)
+    if body is None:
+        tokens = await registry.tokenize(lang, q)
+        body = json_bytes({"tokens": tokens})
+        tokenize_cache.set(key, body)
+    return Response(content=body, media_type="application/json")
+
+@app.post("/tokenize/cn/annotated", dependencies=[Depends(require_dictionaries)])
+@limiter.limit("20/minute")
+async def tokenize_chinese_annotated(request: Request, body: AnnotateRequest):
+    """Segment one or many texts like /tokenize/cn and return tokens with offsets plus their dictionary entries"""
+    return await tokenize_pool.annotate(body.texts)
 
-@app.get("/term/cn/{term}")
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body may read the request while it is sent.
+    StreamingResponse listens for the client disconnecting meanwhile, which takes
+    the request's messages away from Request.stream(); here a disconnect surfaces
+    as ClientDisconnect from the stream instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/tokenize/cn/stream", dependencies=[Depends(require_dictionaries)])
+@limiter.limit("20/minute")
+async def tokenize_chinese_stream(request: Request):
+    """
+    Segment a UTF-8 request body of up to STREAM_MAX_BYTES, answering while it uploads.
+    Responds with NDJSON lines of {"tokens": [{"token", "start", "end"}, ...]},
+    offsets counting characters from the start of the body.
+    """
+    # Refuse up front, once streaming starts the status code can't change
+    tokenize_pool.check_capacity()
+    too_large = f"Request body is larger than {STREAM_MAX_BYTES} bytes"
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and STREAM_MAX_BYTES < int(length):
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=too_large)
+
+    async def stream_tokens():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        chunks = request.stream()
+        pending = ""  # text whose segmentation still depends on what follows
+        offset = 0    # position of pending in the whole body
+        received = 0
+        final = False
+        while not final:
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                chunk = b""
+            final = not chunk
+            received += len(chunk)
+            if STREAM_MAX_BYTES < received:
+                # Chunked uploads have no Content-Length to check beforehand
+                yield json.dumps({"error": too_large}) + "\n"
+                return
+            pending += decoder.decode(chunk, final=final)
+            if not pending or (not final and len(pending) < STREAM_CHUNK_SIZE):
+                continue
+
+            try:
+                spans = await tokenize_pool.tokenize_spans(pending, final)
+            except segmenter_pool.SegmenterBusy:
+                yield json.dumps({"error": "Tokenizer is busy, try again shortly"}) + "\n"
+                return
+
+            if spans:
+                tokens = [
+                    {"token": pending[start:end], "start": offset + start, "end": offset + end}
+                    for start, end, _ in spans
+                ]
+                yield json.dumps({"tokens": tokens}, ensure_ascii=False) + "\n"
+                consumed = spans[-1][1]
+                pending = pending[consumed:]
+                offset += consumed
+
+    return RequestStreamingResponse(stream_tokens(), media_type="application/x-ndjson")
+
+@app.get("/term/{lang}/{term}")
 @limiter.limit("30/minute")
-async def get_term(request: Request, term: str):
-    result = c_dict.search(term)
-    return result
+async def get_term(request: Request, lang: str, term: str, dictionary = Depends(language_dictionary)):
+    key = (lang, term)
+    body = term_cache.get(key)
+    if body is None:
+        # b"" remembers terms that are not in the dictionary
+        body = dictionary.search_json(term) or b""
+        term_cache.set(key, body)
+    if not body:
+        raise HTTPException(status_code=404, detail="Term not found")
+
+    # Entries only change with the dictionary, so its version is a valid ETag for every term
+    headers = {"ETag": f'"{lang}-{dictionary.version}"', "Cache-Control": TERM_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/search/en", dependencies=[Depends(require_dictionaries)])
+@limiter.limit("30/minute")
+async def search_english(
+    request: Request,
+    q: str = Query(..., description="English words to look up", max_length=200),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Chinese entries whose English senses best match q, best first"""
+    key = ("en", q.lower(), limit)
+    body = search_cache.get(key)
+    if body is None:
+        body = c_dict.search_english_json(q, limit)
+        search_cache.set(key, body)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/search/pinyin", dependencies=[Depends(require_dictionaries)])
+@limiter.limit("60/minute")
+async def search_pinyin(
+    request: Request,
+    q: str = Query(..., description="Pinyin, numbered (chao1 shi4), tone-marked (chāoshì) or toneless, may be a prefix", max_length=100),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Entries whose reading starts with q, shortest words first"""
+    key = ("pinyin", q.lower(), limit)
+    body = search_cache.get(key)
+    if body is None:
+        body = c_dict.search_pinyin_json(q, limit)
+        search_cache.set(key, body)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/suggest/cn", dependencies=[Depends(require_dictionaries)])
+@limiter.limit("60/minute")
+async def suggest_chinese(
+    request: Request,
+    prefix: str = Query(..., description="Start of a Chinese word", min_length=1, max_length=20),
+    limit: int = Query(segmenter.SUGGEST_TOP_K, ge=1, le=segmenter.SUGGEST_TOP_K)
+):
+    """Most frequent dictionary words starting with prefix"""
+    key = ("suggest", prefix, limit)
+    body = search_cache.get(key)
+    if body is None:
+        body = json_bytes({"suggestions": c_dict.suggest(prefix, limit)})
+        search_cache.set(key, body)
+    return Response(content=body, media_type="application/json")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency for /admin routes and the stats endpoints, which reveal server internals:
+    the X-Admin-Token header must match ADMIN_TOKEN
+    """
+    if not ADMIN_TOKEN or x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
+@app.post("/admin/dictionary/reload", dependencies=[Depends(require_admin), Depends(require_dictionaries)])
+async def reload_dictionary_endpoint():
+    """
+    Load a new CC-CEDICT release without a restart, see reload_dictionary.
+    Only the worker that receives the request reloads.
+    """
+    try:
+        return await reload_dictionary()
+    except Exception as e:
+        logger.error(f"Dictionary reload failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Dictionary reload failed: {str(e)}")
+
+@app.get("/dictionaries", dependencies=[Depends(require_admin)])
+async def dictionary_stats():
+    """Registered languages, which are loaded and the memory they map"""
+    return registry.stats()
+
+@app.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Hit/miss counters of the tokenization, term, search and user caches"""
+    return {c.name: c.stats() for c in (tokenize_cache, term_cache, search_cache, user_cache)}
+
+@app.get("/db/stats", dependencies=[Depends(require_admin)])
+async def db_stats():
+    """MongoDB connection pool usage of this worker: open, in use and waiting connections"""
+    return pool_stats()
 
 @app.post("/decks", response_model=Deck)
 async def create_new_deck(deck: Deck, current_user: User = Depends(get_current_user)):
@@ -138,7 +596,7 @@ async def create_new_deck(deck: Deck, current_user: User = Depends(get_current_u
     return created_deck
 
 @app.get("/decks/{deck_id}", response_model=Deck)
-async def get_deck_by_id(deck_id: str, current_user: User = Depends(get_current_user)):
+async def get_deck_by_id(deck_id: str, current_user: User = Depends(get_reading_user)):
     deck = await get_deck(deck_id)
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found")
@@ -181,28 +639,215 @@ async def add_flashcard_to_deck(
     if str(deck["user_id"]) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to modify this deck")
     
-    flashcard_data = flashcard.dict(by_alias=True)
-    created_flashcard = await create_flashcard(flashcard_data)
+    created_flashcards = await create_flashcards_in_deck(deck_id, [flashcard.dict(by_alias=True)])
+    if created_flashcards is None:
+        raise HTTPException(status_code=409, detail="Deck is full")
+    return created_flashcards[0]
+
+@app.post("/decks/{deck_id}/flashcards/bulk", response_model=List[Flashcard])
+async def add_flashcards_to_deck(
+    deck_id: str,
+    batch: FlashcardBatch,
+    current_user: User = Depends(get_current_user)
+):
+    """Create many flashcards in a deck at once, either all of them or none"""
+    deck = await get_deck(deck_id, {"user_id": 1})
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    if str(deck["user_id"]) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to modify this deck")
+    
+    created_flashcards = await create_flashcards_in_deck(
+        deck_id, [flashcard.model_dump(by_alias=True) for flashcard in batch.flashcards]
+    )
+    if created_flashcards is None:
+        raise HTTPException(status_code=409, detail="Deck can't hold that many more cards")
+    return created_flashcards
+
+# Import and export formats: ndjson, csv or anki (tab-separated, for Anki's plain text import)
+FLASHCARD_FORMAT = Query("ndjson", pattern="^(ndjson|csv|anki)$")
+# Imported rows validated and inserted per insert_many
+IMPORT_BATCH_SIZE = 500
+# Rejected rows listed in an import's response, the others are only counted
+IMPORT_ERROR_LIMIT = 100
+# An import answers 413 to a Content-Length over IMPORT_MAX_BYTES; rows past
+# IMPORT_MAX_ROWS, or past IMPORT_MAX_BYTES of a chunked upload, are not read
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(8 << 20)))
+
+@app.post("/decks/{deck_id}/flashcards/import")
+@limiter.limit("10/minute")
+async def import_deck_flashcards(
+    request: Request,
+    deck_id: str,
+    format: str = FLASHCARD_FORMAT,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add the flashcards of an uploaded file to a deck. The body is read as a stream and
+    each row validated on its own: invalid rows are reported and the others imported.
+    Reading stops after IMPORT_MAX_ROWS rows or IMPORT_MAX_BYTES, with an error for the rest.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and IMPORT_MAX_BYTES < int(length):
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body is larger than {IMPORT_MAX_BYTES} bytes",
+        )
+    deck = await get_deck(deck_id, {"user_id": 1, "cards": 1})
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    if str(deck["user_id"]) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to modify this deck")
+    
+    room = DECK_CARD_LIMIT - len(deck.get("cards") or [])
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    batch_lines = []
+    
+    def reject(line, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_ERROR_LIMIT:
+            errors.append({"line": line, "error": message})
+    
+    async def flush():
+        nonlocal imported, room
+        result = await import_flashcards(deck_id, batch)
+        if result is None:
+            for line in batch_lines:
+                reject(line, "Deck is full")
+        else:
+            created, batch_errors = result
+            imported += len(created)
+            room -= len(created)
+            for i, message in batch_errors.items():
+                reject(batch_lines[i], message)
+        batch.clear()
+        batch_lines.clear()
+    
+    rows = flashcard_io.read_rows(flashcard_io.capped(request.stream(), IMPORT_MAX_BYTES), format)
+    read = 0
+    last_line = 0
+    try:
+        async for line, row in rows:
+            last_line = line
+            read += 1
+            if read > IMPORT_MAX_ROWS:
+                reject(line, f"Imports are limited to {IMPORT_MAX_ROWS} rows, this row and the rest were not read")
+                break
+            if isinstance(row, flashcard_io.RowError):
+                reject(line, str(row))
+                continue
+            try:
+                flashcard = Flashcard.model_validate(row)
+            except ValidationError as e:
+                reject(line, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+                continue
+            if len(batch) >= room:
+                reject(line, "Deck is full")
+                continue
+            batch.append(flashcard.model_dump(by_alias=True, exclude={"id"}))
+            batch_lines.append(line)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+    except flashcard_io.TooLarge as e:
+        # Chunked uploads have no Content-Length to check beforehand
+        reject(last_line + 1, f"{e}, the rest was not read")
+    if batch:
+        await flush()
     
-    await update_deck(deck_id, {
-        "$push": {"cards": created_flashcard["_id"]}
-    })
-    return created_flashcard
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+@app.get("/decks/{deck_id}/flashcards/export")
+async def export_deck_flashcards(
+    deck_id: str,
+    format: str = FLASHCARD_FORMAT,
+    current_user: User = Depends(get_reading_user)
+):
+    """Download a deck's flashcards in deck order, streamed a batch of cards at a time"""
+    deck = await get_deck(deck_id, {"user_id": 1, "cards": 1})
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    if str(deck["user_id"]) != str(current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to access this deck")
+    
+    async def rows():
+        yield flashcard_io.header(format)
+        async for flashcard in iter_deck_flashcards(deck):
+            yield flashcard_io.serialize(flashcard, format)
+    
+    filename = f"deck-{deck_id}.{flashcard_io.EXTENSIONS[format]}"
+    return StreamingResponse(
+        rows(),
+        media_type=flashcard_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# Page sizes of the deck and flashcard listings; a deck holds at most 1000 cards
+DECK_PAGE_SIZE = 100
+CARD_PAGE_SIZE = 1000
+
+def projection_of(fields: Optional[str], model) -> Optional[dict]:
+    """Mongo projection for a comma-separated fields parameter, None for whole documents"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name == "id" or name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {name: 1 for name in names}
+
+def card_page(card_ids: list, cursor: Optional[str], limit: int):
+    """
+    Keyset page over a deck's ordered card ids: the ids after cursor, the last card
+    id of the previous page. Returns the page and the cursor of the next one.
+    """
+    start = 0
+    if cursor:
+        positions = {str(card_id): i for i, card_id in enumerate(card_ids)}
+        if cursor not in positions:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        start = positions[cursor] + 1
+    page = card_ids[start:start + limit]
+    next_cursor = str(page[-1]) if page and start + limit < len(card_ids) else None
+    return page, next_cursor
+
+def page_response(items: list, response: Response, total: int, next_cursor: Optional[str], projection: Optional[dict]):
+    """
+    Attach X-Total-Count and X-Next-Cursor to a page. Projected documents are partial,
+    so they are returned as-is instead of through the route's response_model.
+    """
+    headers = {"X-Total-Count": str(total)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    if projection is None:
+        response.headers.update(headers)
+        return items
+    return JSONResponse(content=jsonable_encoder(items, custom_encoder={ObjectId: str}), headers=headers)
 
 @app.get("/decks/{deck_id}/flashcards", response_model=List[Flashcard])
-async def get_deck_flashcards(deck_id: str, current_user: User = Depends(get_current_user)):
-    deck = await get_deck(deck_id)
+async def get_deck_flashcards(
+    deck_id: str,
+    response: Response,
+    limit: int = Query(CARD_PAGE_SIZE, ge=1, le=CARD_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated flashcard fields to return"),
+    current_user: User = Depends(get_reading_user)
+):
+    projection = projection_of(fields, Flashcard)
+    deck = await get_deck(deck_id, {"user_id": 1, "cards": 1})
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found")
     if str(deck["user_id"]) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to access this deck")
     
-    flashcards = []
-    for card_id in deck["cards"]:
-        card = await get_flashcard(str(card_id))
-        if card:
-            flashcards.append(card)
-    return flashcards
+    card_ids = deck.get("cards", [])
+    page, next_cursor = card_page(card_ids, cursor, limit)
+    flashcards = await get_flashcards_by_ids(page, projection)
+    return page_response(flashcards, response, len(card_ids), next_cursor, projection)
 
 @app.get("/")
 async def root():
@@ -299,8 +944,7 @@ async def google_callback(request: Request, response: Response, code: str):
         # Update the provider field to clearly indicate this is a Google user
         if user:
             from database import update_user
-            await update_user(user_id, {"provider": "google"})
-            user = await get_user_by_id(user_id)
+            user = await update_user(user_id, {"provider": "google"})
         
         if not user:
             raise HTTPException(
@@ -443,10 +1087,25 @@ async def register_google_user(user_data: User):
 #     return user
 
 @app.get("/user/decks", response_model=List[Deck])
-async def get_current_user_decks(current_user: User = Depends(get_current_user)):
-    """Get all decks for the current logged-in user"""
-    user_decks = await get_user_decks(str(current_user.id))
-    return user_decks
+async def get_current_user_decks(
+    response: Response,
+    limit: int = Query(DECK_PAGE_SIZE, ge=1, le=DECK_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated deck fields to return, e.g. name,description"),
+    current_user: User = Depends(get_reading_user)
+):
+    """Get a page of the current user's decks, oldest first"""
+    projection = projection_of(fields, Deck)
+    if cursor is not None and not ObjectId.is_valid(cursor):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    user_id = str(current_user.id)
+    # One extra deck tells whether there is a next page
+    user_decks, total = await asyncio.gather(
+        get_user_decks(user_id, limit + 1, cursor, projection),
+        count_user_decks(user_id),
+    )
+    next_cursor = str(user_decks[limit - 1]["_id"]) if len(user_decks) > limit else None
+    return page_response(user_decks[:limit], response, total, next_cursor, projection)
 
 @app.get("/user/default-deck", response_model=Deck)
 async def get_user_default_deck(current_user: User = Depends(get_current_user)):
@@ -455,7 +1114,14 @@ async def get_user_default_deck(current_user: User = Depends(get_current_user)):
     return default_deck
 
 @app.get("/user/flashcards", response_model=List[Flashcard])
-async def get_user_flashcards(request: Request, current_user: User = Depends(get_current_user)):
+async def get_user_flashcards(
+    request: Request,
+    response: Response,
+    limit: int = Query(CARD_PAGE_SIZE, ge=1, le=CARD_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated flashcard fields to return"),
+    current_user: User = Depends(get_reading_user)
+):
     """Get all flashcards for the current user across all decks"""
     try:
         # Debug authentication information
@@ -471,18 +1137,19 @@ async def get_user_flashcards(request: Request, current_user: User = Depends(get
             else:
                 print(f"  {name}: {value}")
         
-        # Get the user's default deck
-        default_deck = await get_or_create_user_default_deck(str(current_user.id))
+        # Get the user's default deck; a GET doesn't create it, without one there are no flashcards
+        default_deck = await find_user_default_deck(str(current_user.id), {"cards": 1})
         
-        # Get all flashcards in the deck
-        all_flashcards = []
-        for card_id in default_deck["cards"]:
-            card = await get_flashcard(str(card_id))
-            if card:
-                all_flashcards.append(card)
+        # Get a page of the deck's flashcards with one query
+        projection = projection_of(fields, Flashcard)
+        card_ids = default_deck.get("cards", []) if default_deck else []
+        page, next_cursor = card_page(card_ids, cursor, limit)
+        all_flashcards = await get_flashcards_by_ids(page, projection)
         
         print(f"Found {len(all_flashcards)} flashcards for user {current_user.id}")
-        return all_flashcards
+        return page_response(all_flashcards, response, len(card_ids), next_cursor, projection)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error getting user flashcards: {str(e)}")
         raise HTTPException(
@@ -514,28 +1181,16 @@ async def create_user_flashcard(request: Request, flashcard: Flashcard, current_
                 detail="Could not find or create user's default deck"
             )
         
-        # Create the flashcard
-        flashcard_data = flashcard.model_dump(by_alias=True)
-        created_flashcard = await create_flashcard(flashcard_data)
-        
-        if not created_flashcard:
+        # Create the flashcard in the default deck, in one transaction
+        created_flashcards = await create_flashcards_in_deck(
+            default_deck["_id"], [flashcard.model_dump(by_alias=True)]
+        )
+        if created_flashcards is None:
             raise HTTPException(
-                status_code=500,
-                detail="Failed to create flashcard"
-            )
-        
-        # Add the flashcard to the default deck
-        update_result = await update_deck(str(default_deck["_id"]), {
-            "$push": {"cards": created_flashcard["_id"]}
-        })
-        
-        if not update_result:
-            # Delete the created flashcard if we couldn't add it to the deck
-            await delete_flashcard(str(created_flashcard["_id"]))
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to add flashcard to your deck"
+                status_code=409,
+                detail="Your deck is full"
             )
+        created_flashcard = created_flashcards[0]
         
         print(f"Successfully created flashcard {created_flashcard['_id']} for user {current_user.id}")
         return created_flashcard
@@ -548,13 +1203,33 @@ async def create_user_flashcard(request: Request, flashcard: Flashcard, current_
             detail=f"Error creating flashcard: {str(e)}"
         )
 
+@app.post("/user/flashcards/bulk", response_model=List[Flashcard])
+async def create_user_flashcards(batch: FlashcardBatch, current_user: User = Depends(get_current_user)):
+    """Create many flashcards in the user's default deck at once, e.g. the words of a text"""
+    default_deck = await get_or_create_user_default_deck(str(current_user.id))
+    if not default_deck:
+        raise HTTPException(
+            status_code=500,
+            detail="Could not find or create user's default deck"
+        )
+    
+    created_flashcards = await create_flashcards_in_deck(
+        default_deck["_id"], [flashcard.model_dump(by_alias=True) for flashcard in batch.flashcards]
+    )
+    if created_flashcards is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Your deck can't hold that many more cards"
+        )
+    return created_flashcards
+
 @app.get("/auth/healthcheck", response_model=Dict[str, bool])
 async def auth_healthcheck():
     """Simple healthcheck endpoint to test if authentication is working"""
     return {"status": True}
 
 @app.get("/api/healthcheck", response_model=Dict[str, bool])
-async def protected_healthcheck(current_user: User = Depends(get_current_user)):
+async def protected_healthcheck(current_user: User = Depends(get_reading_user)):
     """Protected healthcheck endpoint that requires authentication"""
     return {"status": True, "authenticated": True}
 
@@ -603,9 +1278,16 @@ async def test_google_oauth_flow():
         }
 
 @app.get("/api/my-flashcards", response_model=List[Flashcard])
-async def get_my_flashcards(request: Request, current_user: User = Depends(get_current_user)):
+async def get_my_flashcards(
+    request: Request,
+    response: Response,
+    limit: int = Query(CARD_PAGE_SIZE, ge=1, le=CARD_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated flashcard fields to return"),
+    current_user: User = Depends(get_reading_user)
+):
     """Get all flashcards for the current user (alias for /user/flashcards)"""
-    return await get_user_flashcards(request, current_user)
+    return await get_user_flashcards(request, response, limit, cursor, fields, current_user)
 
 @app.post("/api/my-flashcards", response_model=Flashcard)
 async def create_my_flashcard(request: Request, flashcard: Flashcard, current_user: User = Depends(get_current_user)):
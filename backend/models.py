@@ -78,4 +78,11 @@ class Deck(BaseModel):
     cards: List[PyObjectId] = Field(default_factory=list, max_items=1000)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now) 
-    
\ No newline at end of file
+    
+
+class AnnotateRequest(BaseModel):
+    texts: List[Annotated[str, StringConstraints(max_length=10000)]] = Field(min_length=1, max_length=100)
+
+class FlashcardBatch(BaseModel):
+    # A deck holds at most 1000 cards
+    flashcards: List[Flashcard] = Field(min_length=1, max_length=1000)
@@ -0,0 +1,173 @@
+import array
+import bisect
+import unicodedata
+
+_UINT = "I"
+NEUTRAL_TONE = 5
+
+# Tone-marked vowel -> (toneless letter, tone); ü is written "v" like in numbered input
+_TONE_MARKS = {
+    marked: (letter, tone)
+    for letter, row in (
+        ("a", "āáǎà"), ("e", "ēéěè"), ("i", "īíǐì"), ("o", "ōóǒò"), ("u", "ūúǔù"), ("v", "ǖǘǚǜ"),
+    )
+    for tone, marked in enumerate(row, 1)
+}
+
+
+def reading_syllables(reading: str) -> list:
+    """
+        Toneless syllables of a CC-CEDICT reading with their tones (0 if unknown),
+        skipping punctuation, e.g. "Lu:3 you2" -> [("lv", 3), ("you", 2)].
+    """
+    syllables = []
+    for token in reading.lower().replace("u:", "v").split():
+        letters = token.rstrip("012345")
+        if(not (letters.isascii() and letters.isalpha())):
+            continue
+        tone = token[len(letters):]
+        syllables.append((letters, (int(tone[-1]) or NEUTRAL_TONE) if tone else 0))
+    return syllables
+
+
+def parse_query(query: str):
+    """
+        Split pinyin input into the letters to match and the constraints it sets.
+        Numbered ("chao1 shi4"), tone-marked ("chāoshì") and toneless ("chaoshi")
+        input can be mixed. A tone number, space or apostrophe ends a syllable.
+
+    Returns:
+        (str, set, list): toneless letters, letter positions where a syllable must
+        end, and (letter position, tone) of the syllables whose tone is given
+    """
+    letters = []
+    boundaries = set()
+    tones = []
+    for char in unicodedata.normalize("NFC", query.lower()):
+        if(char in _TONE_MARKS):
+            letter, tone = _TONE_MARKS[char]
+            tones.append((len(letters), tone))
+            letters.append(letter)
+        elif(char == "ü"):
+            letters.append("v")
+        elif(char == ":" and letters and letters[-1] == "u"):
+            letters[-1] = "v"
+        elif("0" <= char <= "5"):
+            if(letters):
+                tones.append((len(letters) - 1, int(char) or NEUTRAL_TONE))
+                boundaries.add(len(letters))
+        elif("a" <= char <= "z"):
+            letters.append(char)
+        else:
+            boundaries.add(len(letters))
+    boundaries.discard(0)
+    return "".join(letters), boundaries, tones
+
+
+def build_index(readings, frequencies=None):
+    """
+        Sort entries by (syllable count, toneless reading) so a pinyin prefix is a
+        contiguous range of each syllable count, found by binary search. Entries
+        with the same toneless reading, e.g. 超市 and 潮湿, go most frequent first.
+
+    Args:
+        readings: list of CC-CEDICT readings, the entry id is the position in the list
+        frequencies: list of word frequencies by entry id, or None
+
+    Returns:
+        (keys, key_start, order, buckets): order holds entry ids in sorted position,
+        keys the ascii toneless reading of each position from key_start[p] to
+        key_start[p + 1], and the entries with n syllables are at positions
+        buckets[n] to buckets[n + 1]
+    """
+    items = []
+    for entry_id, reading in enumerate(readings):
+        syllables = reading_syllables(reading)
+        if(syllables):
+            frequency = frequencies[entry_id] if frequencies else 0
+            items.append((len(syllables), "".join(letters for letters, _ in syllables), -frequency, entry_id))
+    items.sort()
+
+    keys = bytearray()
+    key_start = array.array(_UINT, [0])
+    order = array.array(_UINT)
+    buckets = array.array(_UINT, [0])
+    for count, key, _, entry_id in items:
+        while(len(buckets) <= count):
+            buckets.append(len(order))
+        keys += key.encode("ascii")
+        key_start.append(len(keys))
+        order.append(entry_id)
+    buckets.append(len(order))
+    return bytes(keys), key_start, order, buckets
+
+
+class PinyinIndex:
+    """
+        Read-only pinyin index over the arrays of build_index (arrays or memoryviews).
+
+    Args:
+        reading: callable entry id -> raw CC-CEDICT reading, to check tones and
+            syllable boundaries of candidates
+    """
+
+    def __init__(self, keys, key_start, order, buckets, reading):
+        self.keys = keys
+        self.key_start = key_start
+        self.order = order
+        self.buckets = buckets
+        self.reading = reading
+
+    def key(self, position: int) -> bytes:
+        return bytes(self.keys[self.key_start[position]:self.key_start[position + 1]])
+
+    def _lower_bound(self, low: int, high: int, prefix: bytes) -> int:
+        while(low < high):
+            middle = (low + high) // 2
+            if(self.key(middle) < prefix):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _matches(self, entry_id: int, boundaries: set, tones: list) -> bool:
+        syllables = reading_syllables(self.reading(entry_id))
+        ends = []
+        total = 0
+        for letters, _ in syllables:
+            total += len(letters)
+            ends.append(total)
+        if(not boundaries.issubset(ends)):
+            return False
+        for position, tone in tones:
+            syllable_tone = syllables[bisect.bisect_right(ends, position)][1]
+            if(syllable_tone and syllable_tone != tone):
+                return False
+        return True
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """
+            Entries whose reading starts with query, fewest syllables first, then in
+            alphabetical order of the toneless reading, then most frequent first. The
+            last syllable of query may be incomplete: "chaos" finds 超市 (chao1 shi4).
+
+        Returns:
+            list[int]: entry ids, at most limit of them
+        """
+        letters, boundaries, tones = parse_query(query)
+        if(not letters):
+            return []
+        prefix = letters.encode("ascii")
+        constrained = bool(boundaries or tones)
+        out = []
+        for count in range(1, len(self.buckets) - 1):
+            end = self.buckets[count + 1]
+            position = self._lower_bound(self.buckets[count], end, prefix)
+            while(position < end and self.key(position).startswith(prefix)):
+                entry_id = self.order[position]
+                if(not constrained or self._matches(entry_id, boundaries, tones)):
+                    out.append(entry_id)
+                    if(limit <= len(out)):
+                        return out
+                position += 1
+        return out
@@ -1,7 +1,9 @@
 import CDict
+import segmenter
 
 if __name__ == "__main__":
-    c_dict = CDict.CDict("./data/cedict_ts.txt")
+    # Also (re)compiles the dictionary snapshot loaded by the server
+    c_dict = CDict.CDict.from_snapshot("./data/cedict_ts.snapshot", "./data/cedict_ts.txt")
 
     jieba_dict_entries = []
     with open("./data/dict.txt.big", "r", encoding="utf8") as file:
@@ -11,4 +13,7 @@ if __name__ == "__main__":
     # print(jieba_dict_entries)
     with open("./data/dict.txt.reduced", "w", encoding="utf8") as file:
         file.write("".join([ " ".join(i) for i in jieba_dict_entries]))
-        
\ No newline at end of file
+        
+
+    # Rebuild jieba's prefix dict cache for the new dictionary
+    segmenter.load_jieba("./data/dict.txt.reduced")
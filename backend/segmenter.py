@@ -0,0 +1,354 @@
+import array
+import logging
+import os
+import time
+from collections import Counter
+
+import jieba
+
+_UINT = "I"
+# Placement attempts before the builder stops looking at the oldest free cells
+_MAX_TRIES = 128
+
+# jieba's dictionary: the default jieba words that are also CC-CEDICT headwords, see preprocess.py
+JIEBA_DICTIONARY = "./data/dict.txt.reduced"
+
+# Completions precomputed per trie state, the most DoubleArrayTrie.complete returns
+SUGGEST_TOP_K = 10
+
+
+def build_double_array(headwords):
+    """
+        Compile headwords into a double-array trie.
+
+        A state s moves along character c to t = base[s] + code(c) when check[t] == s + 1.
+        term[t] holds the headword id + 1 of the word ending at t, or 0.
+
+    Args:
+        headwords: list of words, the headword id is the position in the list
+
+    Returns:
+        (alphabet, base, check, term): uint32 arrays; alphabet lists the codepoint of
+        each character code, starting at code 1
+    """
+    frequency = Counter(char for headword in headwords for char in headword)
+    # Frequent characters get small codes, which keeps the arrays dense
+    alphabet = [char for char, _ in frequency.most_common()]
+    codes = {char: code for code, char in enumerate(alphabet, 1)}
+
+    root = {}
+    for headword_id, headword in enumerate(headwords):
+        node = root
+        for char in headword:
+            node = node.setdefault(char, {})
+        node[None] = headword_id + 1
+
+    base = array.array(_UINT, [0])
+    check = array.array(_UINT, [0])
+    term = array.array(_UINT, [root.get(None, 0)])
+    # next_free[p] leads (with path compression) to the first free cell >= p
+    next_free = [1, 1]
+
+    def grow(size):
+        if(len(base) < size):
+            extra = size - len(base)
+            base.extend([0] * extra)
+            check.extend([0] * extra)
+            term.extend([0] * extra)
+        while(len(next_free) <= size):
+            next_free.append(len(next_free))
+
+    def find_free(position):
+        grow(position + 1)
+        root_position = position
+        while(next_free[root_position] != root_position):
+            root_position = next_free[root_position]
+        while(next_free[position] != root_position):
+            next_free[position], position = root_position, next_free[position]
+        return root_position
+
+    queue = [(root, 0)]
+    # Free cells below scan_start are left as holes once they stop fitting nodes
+    scan_start = 1
+    for node, state in queue:
+        children = sorted((codes[char], child) for char, child in node.items() if char is not None)
+        if(not children):
+            continue
+
+        first, last = children[0][0], children[-1][0]
+        rest = children[1:]
+        position = find_free(max(scan_start, first + 1))
+        tries = 0
+        while(True):
+            offset = position - first
+            grow(offset + last + 1)
+            if(all(next_free[offset + code] == offset + code for code, _ in rest)):
+                break
+            position = find_free(position + 1)
+            tries += 1
+        if(_MAX_TRIES < tries):
+            scan_start = position
+
+        base[state] = offset
+        for code, child in children:
+            target = offset + code
+            next_free[target] = target + 1
+            check[target] = state + 1
+            term[target] = child.get(None, 0)
+            queue.append((child, target))
+
+    return array.array(_UINT, [ord(char) for char in alphabet]), base, check, term
+
+
+def build_completions(trie, headwords, frequencies: dict, k: int = SUGGEST_TOP_K, groups=None):
+    """
+        Precompute the k best completions of every trie state, so completing a
+        prefix costs the same however many headwords start with it. Completions
+        rank by frequency, then shorter headwords first.
+
+    Args:
+        trie (DoubleArrayTrie): The trie over headwords
+        headwords: list of words, the headword id is the position in the list
+        frequencies (dict): word -> frequency, missing words count as 0
+        groups: list of a key per headword, or None. Headwords with the same key,
+            e.g. the traditional and simplified forms of a word, take a single
+            slot: the best ranked of them
+
+    Returns:
+        (top_start, top): uint32 arrays, the headword ids completing state s are
+        top[top_start[s]:top_start[s + 1]]
+    """
+    ranked = sorted(
+        range(len(headwords)),
+        key=lambda headword_id: (-frequencies.get(headwords[headword_id], 0), len(headwords[headword_id]), headword_id),
+    )
+    completions = {}
+    taken = {}
+    for headword_id in ranked:
+        group = headword_id if groups is None else groups[headword_id]
+        for state in trie.states(headwords[headword_id]):
+            best = completions.setdefault(state, [])
+            if(len(best) < k):
+                state_groups = taken.setdefault(state, set())
+                if(group not in state_groups):
+                    state_groups.add(group)
+                    best.append(headword_id)
+
+    top_start = array.array(_UINT, [0])
+    top = array.array(_UINT)
+    for state in range(len(trie.check)):
+        top.extend(completions.get(state, ()))
+        top_start.append(len(top))
+    return top_start, top
+
+
+def load_word_frequencies(dictionary: str = JIEBA_DICTIONARY) -> dict:
+    """
+        Word frequencies of a jieba format dictionary ("word frequency tag" lines).
+    """
+    frequencies = {}
+    with open(dictionary, "r", encoding="utf8") as file:
+        for line in file:
+            fields = line.split()
+            if(2 <= len(fields) and fields[1].isdigit()):
+                frequencies[fields[0]] = max(int(fields[1]), frequencies.get(fields[0], 0))
+    return frequencies
+
+
+class DoubleArrayTrie:
+    """
+        Read-only double-array trie over uint32 sequences (arrays or memoryviews).
+        Matching walks the input by index, so no substrings are created.
+        top_start and top are the optional completions of build_completions.
+    """
+
+    def __init__(self, alphabet, base, check, term, top_start=None, top=None):
+        self.codes = {chr(codepoint): code for code, codepoint in enumerate(alphabet, 1)}
+        self.base = base
+        self.check = check
+        self.term = term
+        self.top_start = top_start
+        self.top = top
+
+    def states(self, word: str):
+        """
+            Yields the state reached after each character of word, stopping where
+            word leaves the trie.
+        """
+        base, check, codes = self.base, self.check, self.codes
+        size = len(check)
+        state = 0
+        for char in word:
+            code = codes.get(char)
+            if(code is None):
+                return
+            target = base[state] + code
+            if(size <= target or check[target] != state + 1):
+                return
+            state = target
+            yield state
+
+    def walk(self, word: str) -> int:
+        """
+            Returns the state reached by word, or -1 if no headword starts with word.
+        """
+        state = 0
+        steps = 0
+        for state in self.states(word):
+            steps += 1
+        return state if steps == len(word) else -1
+
+    def find(self, word: str) -> int:
+        """
+            Returns the headword id of word, or -1 if it is not a headword.
+        """
+        state = self.walk(word)
+        return -1 if state < 0 else self.term[state] - 1
+
+    def complete(self, prefix: str, limit: int = SUGGEST_TOP_K) -> list:
+        """
+            Ids of the most frequent headwords starting with prefix (prefix included).
+        """
+        state = self.walk(prefix)
+        if(state <= 0 or self.top is None):
+            return []
+        start = self.top_start[state]
+        return list(self.top[start:min(start + limit, self.top_start[state + 1])])
+
+    def longest_match(self, text: str, start: int = 0):
+        """
+            Longest headword starting at text[start].
+
+        Returns:
+            (int, int): Length of the match (0 if none) and its headword id (-1 if none)
+        """
+        base, check, term, codes = self.base, self.check, self.term, self.codes
+        size = len(check)
+        state = 0
+        length, headword_id = 0, -1
+        for i in range(start, len(text)):
+            code = codes.get(text[i])
+            if(code is None):
+                break
+            target = base[state] + code
+            if(size <= target or check[target] != state + 1):
+                break
+            state = target
+            if(term[state]):
+                length, headword_id = i - start + 1, term[state] - 1
+        return length, headword_id
+
+    def segment(self, text: str, start: int = 0, end: int = None, final: bool = True):
+        """
+            Forward maximum matching over text[start:end].
+
+            With final=False, text[start:end] is a prefix of a longer stream: segmentation
+            stops before the first token whose match could still grow with more input,
+            so every returned span is the same as segmenting the whole stream. Resume
+            from the end of the last span.
+
+        Returns:
+            list[(int, int, int)]: (start, end, headword id) spans covering the text;
+            characters that start no headword are single spans with headword id -1
+        """
+        base, check, term, codes = self.base, self.check, self.term, self.codes
+        size = len(check)
+        n = len(text) if end is None else end
+        out = []
+        i = start
+        while(i < n):
+            state = 0
+            match_end, headword_id = i + 1, -1
+            j = i
+            while(j < n):
+                code = codes.get(text[j])
+                if(code is None):
+                    break
+                target = base[state] + code
+                if(size <= target or check[target] != state + 1):
+                    break
+                state = target
+                j += 1
+                if(term[state]):
+                    match_end, headword_id = j, term[state] - 1
+            else:
+                if(not final):
+                    break
+            out.append((i, match_end, headword_id))
+            i = match_end
+        return out
+
+
+def _full_mode_block(tokenizer, block: str):
+    """
+        (start, end) spans of jieba's full mode over one run of Han, latin and digit
+        characters, following jieba.Tokenizer.__cut_all step by step.
+    """
+    dag = tokenizer.get_DAG(block)
+    old_j = -1
+    # Consecutive single words starting with a latin letter or digit are joined into one
+    latin = None
+    for k, ends in dag.items():
+        if(latin is not None and not jieba.re_eng.match(block[k])):
+            yield latin
+            latin = None
+        if(len(ends) == 1 and k > old_j):
+            if(jieba.re_eng.match(block[k:ends[0] + 1])):
+                latin = (k if latin is None else latin[0], ends[0] + 1)
+            elif(latin is None):
+                yield k, ends[0] + 1
+            old_j = ends[0]
+        else:
+            for j in ends:
+                if(j > k):
+                    yield k, j + 1
+                    old_j = j
+    if(latin is not None):
+        yield latin
+
+
+def full_mode_spans(tokenizer: jieba.Tokenizer, text: str) -> list:
+    """
+        (start, end) of the words jieba's full mode cuts text into, the segmentation
+        of /tokenize/cn, in the same order. Words overlap; whitespace is skipped.
+    """
+    spans = []
+    offset = 0
+    for block in jieba.re_han_default.split(text):
+        if(jieba.re_han_default.match(block)):
+            spans.extend((offset + start, offset + end) for start, end in _full_mode_block(tokenizer, block))
+        else:
+            position = offset
+            for piece in jieba.re_skip_default.split(block):
+                if(piece.strip()):
+                    spans.append((position, position + len(piece)))
+                position += len(piece)
+        offset += len(block)
+    return spans
+
+
+def load_jieba(dictionary: str = JIEBA_DICTIONARY) -> jieba.Tokenizer:
+    """
+        Create an initialized jieba tokenizer over dictionary. jieba's prefix dict is
+        cached next to the dictionary (dict.txt.reduced.cache), so only the first
+        load after the dictionary changes has to build it.
+
+    Args:
+        dictionary (str): jieba format dictionary, one "word frequency tag" per line
+
+    Returns:
+        jieba.Tokenizer: The ready tokenizer
+    """
+    start = time.perf_counter()
+    tokenizer = jieba.Tokenizer(dictionary)
+    tokenizer.tmp_dir = os.path.dirname(os.path.abspath(dictionary))
+    tokenizer.cache_file = os.path.basename(dictionary) + ".cache"
+    tokenizer.initialize()
+    logging.info("jieba dictionary %s loaded. Took %.3fs.", dictionary, time.perf_counter() - start)
+    return tokenizer
+
+
+if __name__ == "__main__":
+    # Build step: precompute jieba's prefix dict cache
+    logging.basicConfig(level=logging.INFO)
+    load_jieba()
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import segmenter
+
+logger = logging.getLogger("segmenter_pool")
+
+# Segmenters used by the task functions: the server's own instances in thread
+# mode, or instances loaded by _init_process in each pool process
+_segmenters = {}
+
+
+def _init_process(snapshot_path: str, source_path: str, jieba_dictionary: str):
+    # Imported here, CDict imports segmenter through snapshot
+    import CDict
+
+    logging.basicConfig(level=logging.INFO)
+    # The snapshot is memory-mapped, so every process shares the same pages
+    _segmenters["cdict"] = CDict.CDict.from_snapshot(snapshot_path, source_path)
+    _segmenters["jieba"] = segmenter.load_jieba(jieba_dictionary)
+
+
+def _ready() -> bool:
+    return "cdict" in _segmenters and "jieba" in _segmenters
+
+
+def _jieba_cut(text: str, cut_all: bool) -> list:
+    return list(_segmenters["jieba"].cut(text, cut_all=cut_all))
+
+
+def _cdict_tokenize(text: str) -> list:
+    return _segmenters["cdict"].tokenize(text)
+
+
+def _cdict_tokenize_spans(text: str, final: bool) -> list:
+    return _segmenters["cdict"].tokenize_spans(text, final)
+
+
+def _annotate(texts: list) -> dict:
+    jieba_tokenizer = _segmenters["jieba"]
+    return _segmenters["cdict"].annotate(texts, lambda text: segmenter.full_mode_spans(jieba_tokenizer, text))
+
+
+class SegmenterBusy(Exception):
+    """
+        Raised instead of queueing when the pool already has queue_depth tasks waiting.
+    """
+    pass
+
+
+class SegmenterPool:
+    """
+        Runs CPU-bound segmentation outside the event loop.
+
+        mode "thread" shares the server's CDict and jieba instances with a thread pool;
+        mode "process" preloads them in each worker process so segmentation does not
+        hold the server's GIL.
+    """
+
+    def __init__(self, mode: str = "thread", workers: int = 2, queue_depth: int = 32):
+        if(mode not in ("thread", "process")):
+            raise ValueError(f"Unknown segmenter pool mode \"{mode}\"")
+        self.mode = mode
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self.executor = None
+
+    async def start(self, c_dict, jieba_tokenizer, snapshot_path: str, source_path: str,
+                    jieba_dictionary: str = segmenter.JIEBA_DICTIONARY):
+        if(self.mode == "thread"):
+            _segmenters["cdict"] = c_dict
+            _segmenters["jieba"] = jieba_tokenizer
+            executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="segmenter")
+        else:
+            executor = self._process_executor(snapshot_path, source_path, jieba_dictionary)
+        try:
+            await self._warm(executor)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        # The pool counts as started only once every worker is ready
+        self.executor = executor
+        logger.info("Segmenter pool ready: %d %s worker(s), queue depth %d.", self.workers, self.mode, self.queue_depth)
+
+    async def reload(self, c_dict, jieba_tokenizer, snapshot_path: str, source_path: str,
+                     jieba_dictionary: str = segmenter.JIEBA_DICTIONARY):
+        """
+            Switch the workers to a new CDict and jieba. Thread mode swaps the shared instances;
+            process mode starts and warms new processes first, then retires the old
+            ones once the tasks they already have finish.
+        """
+        if(self.mode == "thread"):
+            _segmenters["cdict"] = c_dict
+            _segmenters["jieba"] = jieba_tokenizer
+            return
+        executor = self._process_executor(snapshot_path, source_path, jieba_dictionary)
+        await self._warm(executor)
+        previous, self.executor = self.executor, executor
+        if(previous is not None):
+            previous.shutdown(wait=False)
+        logger.info("Segmenter pool reloaded: %d process worker(s).", self.workers)
+
+    def _process_executor(self, snapshot_path: str, source_path: str, jieba_dictionary: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=(snapshot_path, source_path, jieba_dictionary),
+        )
+
+    async def _warm(self, executor):
+        # Warm every worker up front so the first requests don't pay for process start
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if(self.executor is not None):
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def check_capacity(self):
+        """
+            Raises SegmenterBusy if a new task would be rejected right now.
+        """
+        if(self.workers + self.queue_depth <= self.pending):
+            raise SegmenterBusy()
+
+    async def run(self, function, *args):
+        """
+            Run function(*args) in the pool.
+
+        Raises:
+            SegmenterBusy: every worker is busy and queue_depth tasks are already waiting
+        """
+        self.check_capacity()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    async def cut(self, text: str, cut_all: bool = False) -> list:
+        """
+            jieba segmentation, see jieba.Tokenizer.cut
+        """
+        return await self.run(_jieba_cut, text, cut_all)
+
+    async def tokenize(self, text: str) -> list:
+        """
+            CDict longest-match segmentation, see CDict.tokenize
+        """
+        return await self.run(_cdict_tokenize, text)
+
+    async def tokenize_spans(self, text: str, final: bool = True) -> list:
+        """
+            CDict longest-match spans, see CDict.tokenize_spans
+        """
+        return await self.run(_cdict_tokenize_spans, text, final)
+
+    async def annotate(self, texts: list) -> dict:
+        """
+            jieba full-mode segmentation, like /tokenize/cn, with CDict's entries
+            for the tokens, see CDict.annotate
+        """
+        return await self.run(_annotate, texts)
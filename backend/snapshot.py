@@ -0,0 +1,347 @@
+import array
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import pinyin_search
+import segmenter
+import text_search
+
+logger = logging.getLogger("snapshot")
+
+# Bump whenever the on-disk layout changes; older snapshots are rebuilt.
+SNAPSHOT_VERSION = 9
+MAGIC = b"CDSNAP\x00\x00"
+
+# Sections are stored in this order after the header, each aligned to _ALIGN bytes
+# so they can be cast in place.
+SECTIONS = (
+    "strings",        # utf-8 buffer shared by every string field
+    "entries",        # 8 uint32 per entry: (offset, length) of trad, simp, reading, senses
+    "headwords",      # 2 uint32 per headword: (offset, length), sorted by codepoint
+    "postings_start", # uint32 per headword + 1: start of the headword's ids in "postings"
+    "postings",       # uint32 entry ids
+    "alphabet",       # uint32 codepoint per character code of the double-array trie
+    "da_base",        # double-array trie over the headwords, see segmenter.py
+    "da_check",
+    "da_term",
+    "da_top_start",   # precomputed completions per trie state, see segmenter.build_completions
+    "da_top",
+    "json",           # utf-8 JSON document per entry, as served by /term/cn
+    "json_start",     # uint32 per entry + 1: start of the entry's JSON in "json"
+    "en_terms",       # BM25 index over the English senses, see text_search.py
+    "en_postings_start",
+    "en_postings",
+    "en_weights",
+    "py_keys",        # pinyin index over the readings, see pinyin_search.py
+    "py_key_start",
+    "py_order",
+    "py_buckets",
+)
+# Item format of the sections that are not uint32 arrays; None keeps the raw bytes
+_FORMATS = {"strings": None, "json": None, "en_terms": None, "en_weights": "f", "py_keys": None}
+ENTRY_FIELDS = 8
+
+# magic, version, byteorder, section count, source sha256, then (offset, length) per section
+_HEADER = struct.Struct("<8sIcxxxI32s")
+_SECTION = struct.Struct("<QQ")
+
+_ALIGN = 8
+_UINT = "I"
+assert array.array(_UINT).itemsize == 4
+
+
+def file_digest(filepath: str) -> bytes:
+    """
+        sha256 of a file, used to detect snapshots built from an older dictionary source.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def sources_digest(source_path: str, frequency_path: str = None) -> bytes:
+    """
+        sha256 identifying the inputs of a snapshot: the dictionary source and, if it
+        exists, the word frequency list.
+    """
+    digest = file_digest(source_path)
+    if(frequency_path and os.path.exists(frequency_path)):
+        digest = hashlib.sha256(digest + file_digest(frequency_path)).digest()
+    return digest
+
+
+def read_frequencies(frequency_path: str) -> dict:
+    """
+        Word frequencies for build_image, empty if frequency_path is None or missing.
+    """
+    if(frequency_path and os.path.exists(frequency_path)):
+        return segmenter.load_word_frequencies(frequency_path)
+    return {}
+
+
+def build_image(records, source_digest: bytes, serialize, frequencies: dict = None) -> bytes:
+    """
+        Compile parsed dictionary records into a snapshot image.
+
+    Args:
+        records: iterable of (trad, simp, reading, senses) tuples, in entry id order
+        source_digest (bytes): sha256 of the source file the records came from
+        serialize: callable (entry id, record) -> the entry's JSON as bytes
+        frequencies (dict): headword -> frequency, ranks the trie completions and
+            pinyin homophones
+
+    Returns:
+        bytes: The snapshot image, ready to be written or wrapped by Snapshot
+    """
+    frequencies = frequencies or {}
+    strings = bytearray()
+    entries = array.array(_UINT)
+    headword_ids = {}
+    headword_locations = {}
+    entry_json = bytearray()
+    senses_text = []
+    readings = []
+    entry_frequencies = []
+    json_start = array.array(_UINT, [0])
+
+    def add_string(value: str):
+        encoded = value.encode("utf-8")
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    for i, record in enumerate(records):
+        trad, simp, reading, senses = record
+        entry_json += serialize(i, record)
+        json_start.append(len(entry_json))
+
+        trad_location = add_string(trad)
+        simp_location = trad_location if simp == trad else add_string(simp)
+        entries.extend(trad_location)
+        entries.extend(simp_location)
+        entries.extend(add_string(reading))
+        entries.extend(add_string("/".join(senses)))
+        senses_text.append(" / ".join(senses))
+        readings.append(reading)
+        entry_frequencies.append(max(frequencies.get(trad, 0), frequencies.get(simp, 0)))
+
+        headword_locations.setdefault(trad, trad_location)
+        headword_ids.setdefault(trad, []).append(i)
+        if(trad != simp):
+            headword_locations.setdefault(simp, simp_location)
+            headword_ids.setdefault(simp, []).append(i)
+
+    headwords = sorted(headword_ids)
+    headword_table = array.array(_UINT)
+    postings_start = array.array(_UINT, [0])
+    postings = array.array(_UINT)
+    for headword in headwords:
+        headword_table.extend(headword_locations[headword])
+        postings.extend(headword_ids[headword])
+        postings_start.append(len(postings))
+
+    trie = segmenter.build_double_array(headwords)
+    # Headwords with the same entries are forms of one word, suggested once
+    variants = {}
+    groups = [variants.setdefault(tuple(headword_ids[headword]), len(variants)) for headword in headwords]
+    completions = segmenter.build_completions(segmenter.DoubleArrayTrie(*trie), headwords, frequencies, groups=groups)
+    english = text_search.build_index(senses_text)
+    pinyin = pinyin_search.build_index(readings, entry_frequencies)
+
+    sections = (
+        bytes(strings), entries.tobytes(), headword_table.tobytes(),
+        postings_start.tobytes(), postings.tobytes(),
+        *(values.tobytes() for values in trie),
+        *(values.tobytes() for values in completions),
+        bytes(entry_json), json_start.tobytes(),
+        english[0], *(values.tobytes() for values in english[1:]),
+        pinyin[0], *(values.tobytes() for values in pinyin[1:]),
+    )
+
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, _byteorder(), len(sections), source_digest.ljust(32, b"\x00"))
+    offset = len(header) + _SECTION.size * len(sections)
+    out = bytearray(header)
+    layout = []
+    for section in sections:
+        offset += -offset % _ALIGN
+        layout.append(offset)
+        out += _SECTION.pack(offset, len(section))
+        offset += len(section)
+    for offset, section in zip(layout, sections):
+        out += bytes(offset - len(out))
+        out += section
+    return bytes(out)
+
+
+def write_snapshot(filepath: str, image: bytes):
+    """
+        Atomically replace the snapshot at filepath, so concurrent readers never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(image)
+        # mkstemp creates the file owner-only; every worker needs to map it
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _byteorder() -> bytes:
+    return b"L" if sys.byteorder == "little" else b"B"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class Snapshot:
+    """
+        Read-only view over a snapshot image. Sections are used in place through
+        memoryviews, so a memory-mapped snapshot is shared by every process that
+        maps it instead of being copied into each one.
+    """
+
+    def __init__(self, image):
+        magic, version, byteorder, count, digest = _HEADER.unpack_from(image, 0)
+        if(magic != MAGIC):
+            raise SnapshotError("Not a dictionary snapshot")
+        if(version != SNAPSHOT_VERSION):
+            raise SnapshotError(f"Snapshot version {version}, expected {SNAPSHOT_VERSION}")
+        if(byteorder != _byteorder() or count != len(SECTIONS)):
+            raise SnapshotError("Snapshot was built for a different platform")
+
+        self.version = version
+        self.source_digest = digest
+        self.image = image
+        view = memoryview(image)
+        for k, name in enumerate(SECTIONS):
+            offset, length = _SECTION.unpack_from(image, _HEADER.size + k * _SECTION.size)
+            section = view[offset:offset + length]
+            item_format = _FORMATS.get(name, _UINT)
+            setattr(self, name, section if item_format is None else section.cast(item_format))
+
+        self.trie = segmenter.DoubleArrayTrie(
+            self.alphabet, self.da_base, self.da_check, self.da_term, self.da_top_start, self.da_top
+        )
+        self.english = text_search.InvertedIndex(self.en_terms, self.en_postings_start, self.en_postings, self.en_weights)
+        self.pinyin = pinyin_search.PinyinIndex(self.py_keys, self.py_key_start, self.py_order, self.py_buckets, self.reading)
+        self.entry_count = len(self.entries) // ENTRY_FIELDS
+        self.headword_count = len(self.postings_start) - 1
+
+    @classmethod
+    def read(cls, filepath: str) -> "Snapshot":
+        """
+            Memory-map a snapshot file read-only.
+        """
+        with open(filepath, "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def string(self, offset: int, length: int) -> str:
+        return str(self.strings[offset:offset + length], "utf-8")
+
+    def entry(self, entry_id: int):
+        """
+            Returns the raw (trad, simp, reading, senses) record of an entry.
+        """
+        base = entry_id * ENTRY_FIELDS
+        fields = self.entries[base:base + ENTRY_FIELDS]
+        senses = self.string(fields[6], fields[7])
+        return (
+            self.string(fields[0], fields[1]),
+            self.string(fields[2], fields[3]),
+            self.string(fields[4], fields[5]),
+            senses.split("/") if senses else [],
+        )
+
+    def reading(self, entry_id: int) -> str:
+        """
+            The raw reading of an entry, e.g. "chao1 shi4".
+        """
+        base = entry_id * ENTRY_FIELDS
+        return self.string(self.entries[base + 4], self.entries[base + 5])
+
+    def entry_json(self, entry_id: int):
+        """
+            The entry's precomputed JSON, as a memoryview into the snapshot.
+        """
+        return self.json[self.json_start[entry_id]:self.json_start[entry_id + 1]]
+
+    def headword(self, headword_id: int) -> str:
+        return self.string(self.headwords[2 * headword_id], self.headwords[2 * headword_id + 1])
+
+    def postings_of(self, headword_id: int):
+        return self.postings[self.postings_start[headword_id]:self.postings_start[headword_id + 1]]
+
+    def find(self, term: str) -> int:
+        """
+            Returns the headword id of term, or -1 if it is not a headword.
+        """
+        return self.trie.find(term)
+
+
+def rebuild_if_stale(snapshot_path: str, source_path: str, parse, serialize, frequency_path: str = None,
+                     output_path: str = None) -> bool:
+    """
+        Rebuild the snapshot at snapshot_path from source_path if it is missing, from an
+        older format or built from different source files.
+
+    Args:
+        snapshot_path (str): Snapshot file location
+        source_path (str): Dictionary source, or None to trust the snapshot as is
+        parse: callable turning source_path into dictionary records
+        serialize: see build_image
+        frequency_path (str): jieba format word list ranking the completions, optional
+        output_path (str): Where a rebuilt snapshot is written, snapshot_path if None
+
+    Returns:
+        bool: Whether a snapshot was built
+    """
+    digest = sources_digest(source_path, frequency_path) if source_path and os.path.exists(source_path) else None
+    try:
+        snap = Snapshot.read(snapshot_path)
+        if(digest is None or snap.source_digest == digest):
+            return False
+        logger.info("Snapshot %s is stale, rebuilding.", snapshot_path)
+    except (OSError, ValueError, SnapshotError, struct.error) as e:
+        if(digest is None):
+            raise
+        logger.info("Snapshot %s unusable (%s), rebuilding.", snapshot_path, e)
+
+    write_snapshot(output_path or snapshot_path, build_image(parse(source_path), digest, serialize, read_frequencies(frequency_path)))
+    return True
+
+
+def load_or_build(snapshot_path: str, source_path: str, parse, serialize, frequency_path: str = None) -> Snapshot:
+    """
+        Load the snapshot at snapshot_path, rebuilding it first if needed, see rebuild_if_stale.
+
+    Returns:
+        Snapshot: The loaded snapshot
+    """
+    rebuild_if_stale(snapshot_path, source_path, parse, serialize, frequency_path)
+    return Snapshot.read(snapshot_path)
+
+
+if __name__ == "__main__":
+    import CDict
+
+    logging.basicConfig(level=logging.INFO)
+    source = sys.argv[1] if len(sys.argv) > 1 else "./data/cedict_ts.txt"
+    target = sys.argv[2] if len(sys.argv) > 2 else "./data/cedict_ts.snapshot"
+    frequencies = sys.argv[3] if len(sys.argv) > 3 else segmenter.JIEBA_DICTIONARY
+    image = build_image(
+        CDict.parse_cedict(source), sources_digest(source, frequencies), CDict.entry_json, read_frequencies(frequencies)
+    )
+    write_snapshot(target, image)
+    logger.info("Wrote %s.", target)
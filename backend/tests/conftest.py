@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules are imported top-level, as main.py does
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import CDict
+from conftest import BACKEND
+
+CEDICT_SOURCE = os.path.join(BACKEND, "data", "cedict_ts.txt")
+
+
+def reference_pinyin(reading: str) -> str:
+    """
+        The original reading_to_pinyin: reading_to_syllable on every syllable.
+    """
+    return ";".join([CDict.reading_to_syllable(syllable) for syllable in reading.lower().split(" ")])
+
+
+def test_every_syllable_and_tone_converts_like_the_original():
+    for syllable in CDict.PINYIN_SYLLABLES:
+        for tone in range(10):
+            reading = syllable + str(tone)
+            try:
+                expected = reference_pinyin(reading)
+            except IndexError:
+                # Tones 6-9 fail in reading_to_syllable, they must keep failing
+                with pytest.raises(IndexError):
+                    CDict.reading_to_pinyin(reading)
+                continue
+            assert CDict.reading_to_pinyin(reading) == expected, reading
+
+
+@pytest.mark.skipif(not os.path.exists(CEDICT_SOURCE), reason="data/cedict_ts.txt is not downloaded")
+def test_every_cedict_reading_converts_like_the_original():
+    readings = [reading for _, _, reading, _ in CDict.parse_cedict(CEDICT_SOURCE)]
+    converted = CDict.readings_to_pinyin(readings)
+    assert len(converted) == len(readings)
+    for reading, result in zip(readings, converted):
+        assert result == reference_pinyin(reading), reading
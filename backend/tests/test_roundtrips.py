@@ -0,0 +1,193 @@
+"""
+    Mongo commands sent by the database helpers, counted with a pymongo CommandListener.
+    Needs a server: set MONGODB_TEST_URI, e.g. mongodb://localhost:27017. Each test runs
+    in a scratch database that is dropped afterwards; without a server they are skipped.
+"""
+import asyncio
+import os
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+# database.py requires the Atlas credentials at import, the tests connect to TEST_URI instead
+os.environ.setdefault("DB_USERNAME", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
+import database  # noqa: E402
+
+TEST_URI = os.getenv("MONGODB_TEST_URI")
+TEST_DATABASE = "langlearn_roundtrip_test"
+USER_ID = "roundtrip-user"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Names of the commands sent, leaving out the driver's connection handshakes"""
+
+    IGNORED = ("ping", "hello", "isMaster", "ismaster", "endSessions", "saslStart", "saslContinue")
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in self.IGNORED:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    if not TEST_URI:
+        pytest.skip("MONGODB_TEST_URI is not set")
+    probe = MongoClient(TEST_URI, serverSelectionTimeoutMS=2000)
+    try:
+        probe.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"No MongoDB server at MONGODB_TEST_URI ({type(e).__name__})")
+    finally:
+        probe.close()
+
+
+@pytest.fixture
+def run(server, monkeypatch):
+    """Runs scenario(counter) against the scratch database, counting from after init_db"""
+    monkeypatch.setattr(database, "DB_NAME", TEST_DATABASE)
+    monkeypatch.setattr(database, "transactions_supported", True)
+    database.user_cache.clear()
+
+    def run(scenario):
+        async def main():
+            counter = CommandCounter()
+            # get_client hands out this client, so init_db and the helpers use it
+            database.client = AsyncIOMotorClient(TEST_URI, event_listeners=[counter])
+            try:
+                await database.init_db()
+                counter.commands.clear()
+                await scenario(counter)
+            finally:
+                await database.client.drop_database(TEST_DATABASE)
+                await database.close_db()
+                database.user_cache.clear()
+        asyncio.run(main())
+    return run
+
+
+def new_cards(count):
+    return [{"term": f"词{i}", "reading": ["cí"], "definition": f"card {i}"} for i in range(count)]
+
+
+def test_deck_fetch_takes_two_commands_at_any_deck_size(run):
+    async def scenario(counter):
+        for size in (10, 1000):
+            deck = await database.create_deck({"name": f"Deck {size}", "user_id": USER_ID, "cards": []})
+            assert await database.create_flashcards_in_deck(deck["_id"], new_cards(size))
+
+            # GET /decks/{deck_id}/flashcards: the deck's card ids, then the whole page at once
+            counter.commands.clear()
+            deck = await database.get_deck(str(deck["_id"]), {"user_id": 1, "cards": 1})
+            flashcards = await database.get_flashcards_by_ids(deck["cards"])
+            assert [flashcard["_id"] for flashcard in flashcards] == deck["cards"]
+            assert counter.commands == ["find", "find"], size
+
+    run(scenario)
+
+
+def test_export_takes_one_command_per_batch(run):
+    async def scenario(counter):
+        deck = await database.create_deck({"name": "Deck", "user_id": USER_ID, "cards": []})
+        assert await database.create_flashcards_in_deck(deck["_id"], new_cards(1000))
+        deck = await database.get_deck(str(deck["_id"]))
+
+        counter.commands.clear()
+        exported = [flashcard async for flashcard in database.iter_deck_flashcards(deck, batch_size=400)]
+        assert len(exported) == 1000
+        assert counter.commands == ["find"] * 3
+
+    run(scenario)
+
+
+def test_bulk_create_takes_one_insert_and_one_update(run):
+    async def scenario(counter):
+        deck = await database.create_deck({"name": "Deck", "user_id": USER_ID, "cards": []})
+        # The first call finds out whether the server supports transactions
+        assert await database.create_flashcards_in_deck(deck["_id"], new_cards(1))
+
+        for size in (10, 1000):
+            counter.commands.clear()
+            created = await database.create_flashcards_in_deck(deck["_id"], new_cards(size))
+            assert len(created) == size
+            # Inside a transaction it also commits
+            expected = ["insert", "findAndModify"] + (["commitTransaction"] if database.transactions_supported else [])
+            assert counter.commands == expected, size
+
+    run(scenario)
+
+
+def test_deck_pages_take_two_commands_each(run):
+    async def scenario(counter):
+        names = [f"Deck {i}" for i in range(5)]
+        for name in names:
+            await database.create_deck({"name": name, "user_id": USER_ID, "cards": []})
+
+        # GET /user/decks: a page plus one deck to tell whether there is another, and the total
+        limit, cursor, seen = 2, None, []
+        while True:
+            counter.commands.clear()
+            decks, total = await asyncio.gather(
+                database.get_user_decks(USER_ID, limit + 1, cursor, {"name": 1}),
+                database.count_user_decks(USER_ID),
+            )
+            assert sorted(counter.commands) == ["aggregate", "find"]
+            assert total == len(names)
+            seen.extend(deck["name"] for deck in decks[:limit])
+            if len(decks) <= limit:
+                break
+            cursor = str(decks[limit - 1]["_id"])
+        assert seen == names
+
+    run(scenario)
+
+
+def test_write_helpers_stay_within_their_budget(run):
+    async def scenario(counter):
+        created = {}
+
+        async def create_deck():
+            created["deck"] = await database.create_deck({"name": "Deck", "user_id": USER_ID, "cards": []})
+
+        async def create_flashcard():
+            created["card"] = await database.create_flashcard({"term": "词", "reading": ["cí"], "definition": "word"})
+
+        email = "roundtrip@example.com"
+        # (action, most commands it may send, user action)
+        actions = [
+            ("get_or_create_user, new user", 3, lambda: database.get_or_create_user(USER_ID, email, "Name")),
+            ("get_or_create_user, unchanged", 1, lambda: database.get_or_create_user(USER_ID, email, "Name")),
+            ("get_or_create_user, changed", 2, lambda: database.get_or_create_user(USER_ID, email, "Other")),
+            ("update_user", 1, lambda: database.update_user(USER_ID, {"picture": "picture.png"})),
+            ("create_user", 1, lambda: database.create_user({"email": "other@example.com", "name": "Other"})),
+            ("create_deck", 1, create_deck),
+            ("update_deck", 1, lambda: database.update_deck(str(created["deck"]["_id"]), {"name": "Renamed"})),
+            ("create_flashcard", 1, create_flashcard),
+            ("update_flashcard", 1, lambda: database.update_flashcard(str(created["card"]["_id"]), {"definition": "term"})),
+            ("find_user_default_deck, none yet", 1, lambda: database.find_user_default_deck(USER_ID)),
+            ("get_or_create_user_default_deck, new", 3, lambda: database.get_or_create_user_default_deck(USER_ID)),
+            ("get_or_create_user_default_deck", 1, lambda: database.get_or_create_user_default_deck(USER_ID)),
+            # Inserting and attaching cards is a transaction: insert, update and commit
+            ("create_user_flashcard_direct", 5, lambda: database.create_user_flashcard_direct(
+                USER_ID, {"term": "词", "reading": ["cí"], "definition": "word"})),
+        ]
+        over = []
+        for name, budget, action in actions:
+            counter.commands.clear()
+            await action()
+            if len(counter.commands) > budget:
+                over.append(f"{name}: {', '.join(counter.commands)}")
+        assert not over
+
+    run(scenario)
@@ -0,0 +1,167 @@
+import array
+import heapq
+import math
+import re
+from collections import Counter
+
+_UINT = "I"
+_FLOAT = "f"
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Pinyin readings in brackets, e.g. "supermarket (abbr. for 超級市場|超级市场[chao1 ji2 shi4 chang3])"
+_READING = re.compile(r"\[[^\]]*\]")
+_WORD = re.compile(r"[a-z0-9]+")
+# Too common in CC-CEDICT senses to rank anything; "sb", "sth" and "cl" are CC-CEDICT notation
+STOP_WORDS = frozenset((
+    "a", "an", "and", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "s", "the", "to", "with", "sb", "sth", "cl",
+))
+_VOWELS = frozenset("aeiou")
+
+
+def _is_consonant(word: str, i: int) -> bool:
+    if(word[i] in _VOWELS):
+        return False
+    if(word[i] == "y"):
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(word: str) -> int:
+    """
+        Porter's m: the number of vowel-consonant sequences in word.
+    """
+    m = 0
+    previous_vowel = False
+    for i in range(len(word)):
+        vowel = not _is_consonant(word, i)
+        if(previous_vowel and not vowel):
+            m += 1
+        previous_vowel = vowel
+    return m
+
+
+def _has_vowel(word: str) -> bool:
+    return any(not _is_consonant(word, i) for i in range(len(word)))
+
+
+def _ends_cvc(word: str) -> bool:
+    return (
+        3 <= len(word)
+        and _is_consonant(word, len(word) - 3) and not _is_consonant(word, len(word) - 2)
+        and _is_consonant(word, len(word) - 1) and word[-1] not in "wxy"
+    )
+
+
+def stem(word: str) -> str:
+    """
+        Porter stemmer step 1: strips inflections (plurals, -ed, -ing), so "markets",
+        "marketing" and "market" share a term while "marketplace" does not.
+    """
+    if(len(word) <= 2 or not word.isalpha()):
+        return word
+
+    if(word.endswith("sses") or word.endswith("ies")):
+        word = word[:-2]
+    elif(word.endswith("s") and not word.endswith("ss")):
+        word = word[:-1]
+
+    if(word.endswith("eed")):
+        if(0 < _measure(word[:-3])):
+            word = word[:-1]
+    else:
+        for suffix in ("ed", "ing"):
+            if(word.endswith(suffix) and _has_vowel(word[:-len(suffix)])):
+                word = word[:-len(suffix)]
+                if(word.endswith(("at", "bl", "iz"))):
+                    word += "e"
+                elif(2 <= len(word) and word[-1] == word[-2] and word[-1] not in "lsz"
+                     and _is_consonant(word, len(word) - 1)):
+                    word = word[:-1]
+                elif(_measure(word) == 1 and _ends_cvc(word)):
+                    word += "e"
+                break
+
+    if(word.endswith("y") and _has_vowel(word[:-1])):
+        word = word[:-1] + "i"
+    return word
+
+
+def analyze(text: str) -> list:
+    """
+        Index terms of an English text: lowercased, stemmed words without stop words
+        or bracketed pinyin.
+    """
+    words = _WORD.findall(_READING.sub(" ", text.lower().replace("'s", "")))
+    return [stem(word) for word in words if word not in STOP_WORDS]
+
+
+def build_index(documents):
+    """
+        Compile an inverted index over English documents with every posting's BM25
+        weight computed up front, so a query only sums weights.
+
+    Args:
+        documents: list of strings, the document id is the position in the list
+
+    Returns:
+        (terms, postings_start, postings, weights): terms is the sorted vocabulary,
+        "\\n"-joined as utf-8; the ids of the documents containing terms[k] are
+        postings[postings_start[k]:postings_start[k + 1]], with weights alongside
+    """
+    frequencies = [Counter(analyze(document)) for document in documents]
+    lengths = [sum(counts.values()) for counts in frequencies]
+    average_length = sum(lengths) / max(1, len(lengths)) or 1.0
+
+    term_postings = {}
+    for document_id, counts in enumerate(frequencies):
+        for term, count in counts.items():
+            term_postings.setdefault(term, []).append((document_id, count))
+
+    terms = sorted(term_postings)
+    postings_start = array.array(_UINT, [0])
+    postings = array.array(_UINT)
+    weights = array.array(_FLOAT)
+    for term in terms:
+        matches = term_postings[term]
+        idf = math.log(1 + (len(documents) - len(matches) + 0.5) / (len(matches) + 0.5))
+        for document_id, count in matches:
+            norm = K1 * (1 - B + B * lengths[document_id] / average_length)
+            postings.append(document_id)
+            weights.append(idf * count * (K1 + 1) / (count + norm))
+        postings_start.append(len(postings))
+    return "\n".join(terms).encode("utf-8"), postings_start, postings, weights
+
+
+class InvertedIndex:
+    """
+        Read-only BM25 index over the arrays of build_index (arrays or memoryviews).
+    """
+
+    def __init__(self, terms, postings_start, postings, weights):
+        text = str(terms, "utf-8")
+        self.term_ids = {term: k for k, term in enumerate(text.split("\n"))} if text else {}
+        self.postings_start = postings_start
+        self.postings = postings
+        self.weights = weights
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """
+            Documents matching any term of query, best first.
+
+        Returns:
+            list[(int, float)]: (document id, BM25 score), at most limit of them
+        """
+        scores = {}
+        for term in set(analyze(query)):
+            k = self.term_ids.get(term)
+            if(k is None):
+                continue
+            start, end = self.postings_start[k], self.postings_start[k + 1]
+            for document_id, weight in zip(self.postings[start:end], self.weights[start:end]):
+                scores[document_id] = scores.get(document_id, 0.0) + weight
+        # Ties go to the lower id, i.e. the earlier dictionary entry
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
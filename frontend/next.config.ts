@@ -21,6 +21,14 @@ const nextConfig: NextConfig = {
         source: '/api/tokenize/cn',
         destination: `${DICTIONARY_SERVER}/tokenize/cn`,
       },
+      {
+        source: '/api/tokenize/cn/annotated',
+        destination: `${DICTIONARY_SERVER}/tokenize/cn/annotated`,
+      },
+      {
+        source: '/api/tokenize/cn/stream',
+        destination: `${DICTIONARY_SERVER}/tokenize/cn/stream`,
+      },
       {
         source: '/api/term/jp/:term',
         destination: `${DICTIONARY_SERVER}/term/jp/:term`,
@@ -29,6 +37,18 @@ const nextConfig: NextConfig = {
         source: '/api/term/cn/:term',
         destination: `${DICTIONARY_SERVER}/term/cn/:term`,
       },
+      {
+        source: '/api/search/en',
+        destination: `${DICTIONARY_SERVER}/search/en`,
+      },
+      {
+        source: '/api/search/pinyin',
+        destination: `${DICTIONARY_SERVER}/search/pinyin`,
+      },
+      {
+        source: '/api/suggest/cn',
+        destination: `${DICTIONARY_SERVER}/suggest/cn`,
+      },
       {
         source: '/api/kanji/jp/:term',
         destination: `${DICTIONARY_SERVER}/kanji/jp/:term`,
@@ -48,6 +68,22 @@ const nextConfig: NextConfig = {
       {
         source: '/api/decks/:deck/flashcards',
         destination: `${DICTIONARY_SERVER}/decks/:deck/flashcards`,
+      },
+      {
+        source: '/api/decks/:deck/flashcards/bulk',
+        destination: `${DICTIONARY_SERVER}/decks/:deck/flashcards/bulk`,
+      },
+      {
+        source: '/api/decks/:deck/flashcards/import',
+        destination: `${DICTIONARY_SERVER}/decks/:deck/flashcards/import`,
+      },
+      {
+        source: '/api/decks/:deck/flashcards/export',
+        destination: `${DICTIONARY_SERVER}/decks/:deck/flashcards/export`,
+      },
+      {
+        source: '/api/user/flashcards/bulk',
+        destination: `${DICTIONARY_SERVER}/user/flashcards/bulk`,
       }
     ]
   },
@@ -1,7 +1,7 @@
 "use client"
 import { FlashcardListItem } from "@/components/flashcard-list/flashcard-list";
 import styles from "./page.module.css"
-import ChineseInput, { TokenCard } from "@/components/interactive-text-input/chinese-input";
+import ChineseInput, { TokenCard, TokenEntries } from "@/components/interactive-text-input/chinese-input";
 import { DeckID } from "@/types/deck";
 import { Flashcard } from "@/types/flashcard";
 import { useState } from "react";
@@ -14,6 +14,7 @@ import { GoArrowLeft } from "react-icons/go";
 export function TokenEditor({ cards, deckId, deckIDB64 } : { cards: Flashcard[], deckId: DeckID, deckIDB64: string }) {
 
     const [tokens, setTokens] = useState<string[]>([]);
+    const [entries, setEntries] = useState<TokenEntries>({});
 
     
 
@@ -28,8 +29,9 @@ export function TokenEditor({ cards, deckId, deckIDB64 } : { cards: Flashcard[],
                 </p>
             </div>
             <div className="mb-8" style={{marginBottom: "48px"}}>
-            <ChineseInput setTokens={(tokens) => {
+            <ChineseInput setTokens={(tokens, entries) => {
                 setTokens(Array.from(new Set(tokens)));
+                setEntries(entries);
             }} />
             </div>
 
@@ -42,6 +44,7 @@ export function TokenEditor({ cards, deckId, deckIDB64 } : { cards: Flashcard[],
                             cards={cards}
                             key={i} 
                             token={token} 
+                            entries={entries[token] ?? null}
                             deckId={deckId}
                         />
                     ))}
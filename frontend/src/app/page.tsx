@@ -10,7 +10,7 @@ import { RubyDisplay } from "@/components/ruby-display/ruby-display";
 import { GoPlus } from "react-icons/go";
 import { createFlashcard } from "@/actions/deck-actions";
 import { useSession } from "next-auth/react";
-import ChineseInput, { TokenCard } from "@/components/interactive-text-input/chinese-input";
+import ChineseInput, { TokenCard, TokenEntries } from "@/components/interactive-text-input/chinese-input";
 import Link from "next/link";
 import { Button } from "@/components/ui/button";
 
@@ -24,6 +24,7 @@ interface JPToken {
 export default function Home() {
 
     const [ tokens, setTokens ] = useState<string[]>([]);
+    const [ entries, setEntries ] = useState<TokenEntries>({});
 
     return (<>
             <div className="mb-8" style={{margin: "48px 0"}}>
@@ -33,9 +34,12 @@ export default function Home() {
                 </p>
             </div>
             
-            <ChineseInput setTokens={setTokens} />
+            <ChineseInput setTokens={(tokens, entries) => {
+                setTokens(tokens);
+                setEntries(entries);
+            }} />
             <div className={styles["grid"]} >
-                {tokens.map((token, i) => <TokenCard token={token} key={i}/>)}
+                {tokens.map((token, i) => <TokenCard token={token} entries={entries[token] ?? null} key={i}/>)}
             </div>
     </>
     );
@@ -2,7 +2,7 @@
 
 import styles from "./chinese-input.module.css";
 import { useState, useEffect } from 'react'
-import { CDictEntry } from '@/types/cdict'
+import { AnnotatedTexts, CDictEntry } from '@/types/cdict'
 
 import { addFlashcardToDeck } from '@/actions/deck-actions'
 
@@ -11,8 +11,11 @@ import { Flashcard } from '@/types/flashcard'
 import { TimelineControl } from "../flashcard-control-bar/flashcard-control-bar";
 import { useRouter } from "next/navigation";
 
+export type TokenEntries = AnnotatedTexts["entries"];
+
 interface ChineseInputProps {
-  setTokens: (a:string[])=>void
+  // Tokens of the text in order, with the dictionary entries of those that have any
+  setTokens: (tokens: string[], entries: TokenEntries)=>void
 }
 
 export default function ChineseInput({ setTokens }: ChineseInputProps) {
@@ -25,22 +28,27 @@ export default function ChineseInput({ setTokens }: ChineseInputProps) {
   // Tokenize the input text when it changes
   useEffect(() => {
     if (!text.trim()) {
-      setTokens([]);
+      setTokens([], {});
       return;
     }
 
     // Debounce to avoid too many requests
     const timeoutId = setTimeout(() => {
       setLoading(true);
-      fetch(`/api/tokenize/cn?q=${encodeURIComponent(text.trim())}`)
+      // One request segments the text and looks up every token
+      fetch('/api/tokenize/cn/annotated', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ texts: [text.trim()] })
+      })
         .then(res => {
           if (!res.ok) {
             throw new Error(`Server responded with ${res.status}`);
           }
           return res.json();
         })
-        .then((data: { tokens: string[] }) => {
-          setTokens(data.tokens || []);
+        .then((data: AnnotatedTexts) => {
+          setTokens((data.texts[0] || []).map((t) => t.token), data.entries || {});
           setLoading(false);
         })
         .catch(err => {
@@ -89,12 +97,15 @@ export default function ChineseInput({ setTokens }: ChineseInputProps) {
 
 interface TokenCardProps {
   token: string;
+  // Entries from ChineseInput; looked up with /api/term/cn when not given
+  entries?: CDictEntry[] | null;
   deckId?: string;
   cards?: Flashcard[]
 }
 
-export function TokenCard({ token, deckId, cards }: TokenCardProps) {
-  const [entries, setEntries] = useState<CDictEntry[] | null>(null);
+export function TokenCard({ token, entries: givenEntries, deckId, cards }: TokenCardProps) {
+  const [fetchedEntries, setEntries] = useState<CDictEntry[] | null>(null);
+  const entries = (givenEntries !== undefined ? givenEntries : fetchedEntries);
   const [loading, setLoading] = useState(false);
   const [adding, setAdding] = useState(false);
   // const [added, setAdded] = useState(false);
@@ -108,9 +119,13 @@ export function TokenCard({ token, deckId, cards }: TokenCardProps) {
   }) : false);
   // Fetch translation for this token
   useEffect(() => {
+    if (givenEntries !== undefined) return;
     setLoading(true);
     fetch(`/api/term/cn/${encodeURIComponent(token)}`)
       .then(res => {
+        if (res.status === 404) {
+          return null;
+        }
         if (!res.ok) {
           throw new Error(`Server responded with ${res.status}`);
         }
@@ -130,7 +145,7 @@ export function TokenCard({ token, deckId, cards }: TokenCardProps) {
       }).finally(() => {
         setLoading(false);
       });
-  }, [token]);
+  }, [token, givenEntries]);
 
   const handleAddClick = async () => {
     if(!deckId) return;
@@ -8,4 +8,15 @@ export interface CDictEntry {
 
     reading: string,
     senses: string[]
-};
\ No newline at end of file
+};
+export interface AnnotatedToken {
+    token: string,
+    start: number,
+    end: number
+};
+
+// Response of POST /api/tokenize/cn/annotated
+export interface AnnotatedTexts {
+    texts: AnnotatedToken[][],
+    entries: { [token: string]: CDictEntry[] }
+};